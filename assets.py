@@ -0,0 +1,348 @@
+"""
+assets.py — the local HTTP server launched apps are loaded from.
+One server process per user listens on a fixed port (get_asset_server_port()) and serves
+APPS_DIR/<id> at http://<label>.localhost:<port>/<tag>/..., routing on the Host header.
+Each app has its own origin (see host_label()), so apps can't read each other's
+localStorage, IndexedDB or cookies, and that origin is the same on every launch, so an
+app's own storage persists. <tag> changes whenever the app's files do, so every response
+can be cached as immutable under a strong ETag (the file's sha256 from manifest.json) in
+the webview's persistent HTTP cache. Small hot files are kept in an in-memory LRU for as
+long as the server runs, gzip/brotli variants written by precompress() at install time are
+served to clients that accept them, and single byte ranges are supported so media can be
+streamed and seeked.
+
+Runners call ensure_server(), which starts the server process if it isn't up yet; it exits
+by itself after ASSET_SERVER_IDLE seconds without requests or running apps.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from config import (APPS_DIR, CHUNK_SIZE, EXTRACT_WORKERS, ASSET_CACHE_BYTES, ASSET_CACHE_MAX_FILE,
+                    PRECOMPRESS_MIN_SIZE, ASSET_SERVER_IDLE, get_asset_server_port, get_asset_server_args)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VARIANTS_DIR = ".om-assets"  # inside each app dir: <sha256>.br / <sha256>.gz
+COMPRESSIBLE = {".html", ".htm", ".js", ".mjs", ".css", ".json", ".svg", ".wasm", ".txt", ".xml", ".map"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+PING_PATH = "/__openmetro_assets__"  # lets a runner tell our server from something else on the port
+_LABEL = re.compile(r"[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?")
+
+def host_label(app_id):
+    """The DNS label of app_id's origin, <label>.localhost. Ids that aren't already a valid
+    lowercase label are hashed; "--" can't occur in a plain one, so the two never collide."""
+    if _LABEL.fullmatch(app_id) and "--" not in app_id:
+        return app_id
+    return "x--" + hashlib.sha256(app_id.encode()).hexdigest()[:24]
+
+# --- Install time ---
+
+def precompress(app_dir, files, reuse_from=None):
+    """Writes .br/.gz variants of compressible files in files ({path: {"size", "sha256"}}),
+    skipping any that don't shrink by at least 10%. Variants already made for the same
+    content in reuse_from (the previous install, on updates) are linked instead."""
+    out = Path(app_dir) / VARIANTS_DIR
+    previous = Path(reuse_from) / VARIANTS_DIR if reuse_from else None
+    todo = {info["sha256"]: path for path, info in files.items()
+            if info["size"] >= PRECOMPRESS_MIN_SIZE and Path(path).suffix.lower() in COMPRESSIBLE}
+    if not todo:
+        return
+    out.mkdir(exist_ok=True)
+
+    def one(item):
+        sha, path = item
+        if previous is not None:
+            reused = False
+            for ext in ("br", "gz"):
+                try:
+                    os.link(previous / f"{sha}.{ext}", out / f"{sha}.{ext}")
+                    reused = True
+                except OSError:
+                    pass
+            if reused:
+                return
+        data = (Path(app_dir) / path).read_bytes()
+        encoders = [("gz", lambda d: gzip.compress(d, 9, mtime=0))]
+        if brotli:
+            encoders.append(("br", lambda d: brotli.compress(d, quality=9)))
+        for ext, encode in encoders:
+            packed = encode(data)
+            if len(packed) <= len(data) * 0.9:
+                (out / f"{sha}.{ext}").write_bytes(packed)
+
+    with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as pool:
+        list(pool.map(one, todo.items()))  # zlib and brotli release the GIL
+
+# --- Serving ---
+
+class _App:
+    """Per-app state loaded from its manifest: the URL tag and the file hash table."""
+    def __init__(self, app_id):
+        self.dir = APPS_DIR / app_id
+        manifest_path = self.dir / "manifest.json"
+        self.mtime = manifest_path.stat().st_mtime_ns
+        manifest = json.loads(manifest_path.read_text())
+        self.files = manifest.get("files") or {}
+        self.tag = hashlib.sha256(json.dumps([manifest.get("version"), self.files], sort_keys=True)
+                                  .encode()).hexdigest()[:12]
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # SO_REUSEADDR on Windows would let a second server bind the same port
+    allow_reuse_address = sys.platform != "win32"
+
+class AssetServer:
+    def __init__(self, port=0, cache_bytes=ASSET_CACHE_BYTES):
+        self.cache_bytes = cache_bytes
+        self.last_request = time.monotonic()
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (etag, encoding) -> bytes; etags change with content
+        self._cached = 0
+        self._apps = {}
+        self._labels = {}  # host label -> app id, rebuilt from APPS_DIR on a miss
+        self._httpd = _HTTPServer(("127.0.0.1", port), _handler_for(self))
+        self.port = self._httpd.server_address[1]
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _app_for_host(self, host):
+        name = (host or "").rsplit(":", 1)[0].lower()
+        label, dot, domain = name.partition(".")
+        if not dot or domain != "localhost":
+            return None
+        with self._lock:
+            app_id = self._labels.get(label)
+        if app_id is None:  # installed since we last looked, or not an app at all
+            try:
+                labels = {host_label(entry): entry for entry in os.listdir(APPS_DIR)}
+            except OSError:
+                return None
+            with self._lock:
+                self._labels = labels
+            app_id = labels.get(label)
+        return self._app(app_id) if app_id else None
+
+    def _app(self, app_id):
+        with self._lock:
+            app = self._apps.get(app_id)
+        try:
+            mtime = (APPS_DIR / app_id / "manifest.json").stat().st_mtime_ns
+        except OSError:
+            return None
+        if app is None or app.mtime != mtime:  # installed or updated since we last looked
+            app = _App(app_id)
+            with self._lock:
+                self._apps[app_id] = app
+        return app
+
+    def _read(self, path, etag, encoding, size):
+        """Returns the file's bytes, from the LRU when small enough to be worth keeping."""
+        key = (etag, encoding)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+        data = path.read_bytes()
+        if size <= ASSET_CACHE_MAX_FILE:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = data
+                    self._cached += len(data)
+                while self._cached > self.cache_bytes and self._cache:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached -= len(evicted)
+        return data
+
+def _parse_range(header, size):
+    """Returns (start, end) inclusive for a single "bytes=" range, or None if unsatisfiable."""
+    try:
+        unit, spec = header.split("=", 1)
+        if unit.strip() != "bytes" or "," in spec:
+            return None
+        first, last = spec.strip().split("-", 1)
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = size - int(last), size - 1
+    except ValueError:
+        return None
+    start, end = max(start, 0), min(end, size - 1)
+    return (start, end) if start <= end else None
+
+def _handler_for(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive between the webview and us
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.do_GET(head=True)
+
+        def do_GET(self, head=False):
+            server.last_request = time.monotonic()
+            if self.path == PING_PATH:
+                body = PING_PATH.encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                return None if head else self.wfile.write(body)
+            parts = unquote(urlsplit(self.path).path).lstrip("/").split("/", 1)
+            app = server._app_for_host(self.headers.get("Host")) if len(parts) == 2 else None
+            if app is None or parts[0] != app.tag:
+                return self._error(404)
+            rel = parts[1] or "index.html"
+            path = (app.dir / rel).resolve()
+            root = app.dir.resolve()
+            if root not in path.parents or VARIANTS_DIR in Path(rel).parts:
+                return self._error(404)
+            if path.is_dir():
+                path, rel = path / "index.html", f"{rel.rstrip('/')}/index.html"
+            try:
+                size = path.stat().st_size
+            except OSError:
+                return self._error(404)
+
+            info = app.files.get(Path(rel).as_posix())
+            byte_range = self.headers.get("Range")
+            encoding, body_path = None, path
+            if info and not byte_range:
+                accepted = self.headers.get("Accept-Encoding") or ""
+                for name, ext in (("br", "br"), ("gzip", "gz")):
+                    variant = app.dir / VARIANTS_DIR / f"{info['sha256']}.{ext}"
+                    if name in accepted and variant.exists():
+                        encoding, body_path = name, variant
+                        break
+            body_size = body_path.stat().st_size if encoding else size
+
+            # Each encoding is a different byte sequence, so it gets its own strong ETag
+            validator = info["sha256"] if info else f"{size:x}-{path.stat().st_mtime_ns:x}"
+            etag = f'"{validator}-{encoding}"' if encoding else f'"{validator}"'
+            if etag in (self.headers.get("If-None-Match") or ""):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", IMMUTABLE)
+                self.send_header("Content-Length", "0")
+                return self.end_headers()
+
+            content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+            start, end, status = 0, body_size - 1, 200
+            if byte_range:
+                parsed = _parse_range(byte_range, size)
+                if parsed is None:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    return self.end_headers()
+                (start, end), status = parsed, 206
+
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", IMMUTABLE)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+            if head:
+                return
+            try:
+                if body_size <= ASSET_CACHE_MAX_FILE:
+                    self.wfile.write(server._read(body_path, etag, encoding, body_size)[start:end + 1])
+                    return
+                with open(body_path, "rb") as f:  # big media streams straight from disk
+                    f.seek(start)
+                    remaining = end - start + 1
+                    while remaining:
+                        chunk = f.read(min(CHUNK_SIZE * 8, remaining))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the page navigated away mid-response
+
+        def _error(self, code):
+            self.send_response(code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    return Handler
+
+def app_url(app_id, entry):
+    """URL of entry (a path inside APPS_DIR/app_id) on the asset server."""
+    app = _App(app_id)
+    rel = Path(entry).resolve().relative_to(app.dir.resolve()).as_posix()
+    return f"http://{host_label(app_id)}.localhost:{get_asset_server_port()}/{app.tag}/{rel}"
+
+def _ping(timeout=0.5):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{get_asset_server_port()}{PING_PATH}",
+                                    timeout=timeout) as r:
+            return r.read() == PING_PATH.encode()
+    except Exception:
+        return False
+
+def ensure_server(wait=3.0):
+    """Makes sure the shared asset server is running, starting it if needed. Returns False
+    if it couldn't be reached (e.g. something else owns the port) - load from disk then."""
+    if _ping():
+        return True
+    try:
+        subprocess.Popen(get_asset_server_args(), close_fds=True, stdin=subprocess.DEVNULL,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        print(f"Warning: could not start the asset server: {e}")
+        return False
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if _ping():
+            return True
+        time.sleep(0.05)
+    return False
+
+def main():
+    """Entry point of the server process. Exits quietly if another one already has the port."""
+    import running
+    try:
+        server = AssetServer(port=get_asset_server_port())
+    except OSError:
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while True:
+        time.sleep(min(ASSET_SERVER_IDLE, 30))
+        idle = time.monotonic() - server.last_request >= ASSET_SERVER_IDLE
+        if idle and not running.index.refresh_all():
+            server.shutdown()
+            return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+blobs.py — content-addressable store for extracted app files.
+Each distinct file is kept once under BLOB_DIR by SHA-256 and hard-linked into every
+app dir that ships it, so the file's link count doubles as its reference count.
+Blobs are only ever looked up by a SHA-256 computed from the content itself, and files in
+app dirs must never be written in place (replace them instead) since that would write
+through the link into every other app sharing the blob.
+"""
+import os
+from config import BLOB_DIR
+
+def blob_path(sha):
+    return BLOB_DIR / sha[:2] / sha[2:]
+
+def link(sha, target):
+    """Hard-links blob `sha` to target. Returns False if there's no such blob or linking isn't possible."""
+    try:
+        os.link(blob_path(sha), target)
+        return True
+    except OSError:
+        return False
+
+def ingest(path, sha):
+    """Makes path share storage with the blob for sha, adding it to the store if it's new.
+    Returns True if path now shares an existing blob."""
+    blob = blob_path(sha)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(path, blob)
+        return False
+    except FileExistsError:
+        pass
+    except OSError:
+        return False  # no hard links on this volume - keep the private copy
+    # Already stored: swap our copy for a link to the existing blob
+    tmp = path.with_name(path.name + ".blob")
+    try:
+        os.link(blob, tmp)
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return False
+
+def collect(shas=None):
+    """Deletes blobs no app links to any more. Checks only `shas` when given, else the whole store."""
+    if shas is None:
+        blobs = [p for p in BLOB_DIR.glob("??/*") if p.is_file()]
+    else:
+        blobs = [blob_path(sha) for sha in set(shas)]
+    freed = 0
+    for blob in blobs:
+        try:
+            st = blob.stat()
+            if st.st_nlink <= 1:
+                blob.unlink()
+                freed += st.st_size
+        except OSError:
+            pass
+    return freed
+
+def stats():
+    count = size = 0
+    for blob in BLOB_DIR.glob("??/*"):
+        try:
+            size += blob.stat().st_size
+            count += 1
+        except OSError:
+            pass
+    return {"blobs": count, "bytes": size}
@@ -0,0 +1,129 @@
+"""
+cache.py — bounded, compressed storage for CACHE_DIR.
+Metadata entries are stored gzip-compressed. When the directory grows past CACHE_MAX_BYTES
+the least recently used entries are evicted, and partial downloads nobody has touched for
+PARTIAL_MAX_AGE are dropped. Access times are stamped explicitly on read, so LRU order
+doesn't depend on the filesystem being mounted with atime updates.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from config import CACHE_DIR, CACHE_MAX_BYTES, PARTIAL_MAX_AGE, CACHE_EVICT_INTERVAL
+
+_SIDECARS = (".meta", ".state")
+_lock = threading.Lock()
+_last_evict = [0.0]
+
+def path_for(name):
+    return CACHE_DIR / f"{name}.gz"
+
+def atomic_write(path, data):
+    # Concurrent writers each get their own temp file; the rename means readers never see a torn file
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def _touch_access(path):
+    # Bump atime only; mtime is what callers use for freshness
+    try:
+        os.utime(path, (time.time(), path.stat().st_mtime))
+    except OSError:
+        pass
+
+def read_json(path):
+    data = json.loads(gzip.decompress(path.read_bytes()))
+    _touch_access(path)
+    return data
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, gzip.compress(json.dumps(data).encode(), compresslevel=6))
+    maybe_evict()
+
+def _entries():
+    """Groups CACHE_DIR files into entries: a main file plus its .meta/.state sidecars."""
+    groups = {}
+    for f in CACHE_DIR.iterdir():
+        if not f.is_file():
+            continue
+        base = f.name
+        for suffix in _SIDECARS:
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+        groups.setdefault(base, []).append(f)
+
+    entries = []
+    for base, files in groups.items():
+        try:
+            stats = {f: f.stat() for f in files}
+        except OSError:
+            continue  # raced with a delete
+        main = stats.get(CACHE_DIR / base) or max(stats.values(), key=lambda st: st.st_mtime)
+        entries.append({
+            "name": base,
+            "files": files,
+            "bytes": sum(st.st_size for st in stats.values()),
+            "atime": max(main.st_atime, main.st_mtime),
+            "mtime": main.st_mtime,
+            "partial": base.endswith(".zip"),
+            "temp": base.endswith(".tmp"),
+        })
+    return entries
+
+def _remove(entry):
+    for f in entry["files"]:
+        try:
+            f.unlink()
+        except OSError:
+            pass
+
+def evict(budget=None):
+    """Drops expired partials and stray temp files, then LRU entries until under budget.
+    Returns the number of bytes freed."""
+    if budget is None:
+        budget = CACHE_MAX_BYTES
+    if not CACHE_DIR.exists():
+        return 0
+    with _lock:
+        _last_evict[0] = time.time()
+        now = time.time()
+        freed = 0
+        keep = []
+        for e in _entries():
+            if (e["partial"] and now - e["mtime"] > PARTIAL_MAX_AGE) or (e["temp"] and now - e["mtime"] > 3600):
+                _remove(e)
+                freed += e["bytes"]
+            else:
+                keep.append(e)
+
+        total = sum(e["bytes"] for e in keep)
+        for e in sorted(keep, key=lambda e: e["atime"]):
+            if total <= budget:
+                break
+            if e["partial"] or e["temp"]:
+                continue  # may still be being written
+            _remove(e)
+            total -= e["bytes"]
+            freed += e["bytes"]
+    return freed
+
+def maybe_evict():
+    """Runs evict() on a background thread, at most once per CACHE_EVICT_INTERVAL."""
+    if time.time() - _last_evict[0] < CACHE_EVICT_INTERVAL:
+        return
+    _last_evict[0] = time.time()
+    threading.Thread(target=evict, daemon=True).start()
+
+def stats():
+    """Cache occupancy: entry count, bytes used, budget and how much of it is partial downloads."""
+    entries = _entries() if CACHE_DIR.exists() else []
+    partial = [e for e in entries if e["partial"]]
+    return {
+        "entries": len(entries),
+        "bytes": sum(e["bytes"] for e in entries),
+        "budget": CACHE_MAX_BYTES,
+        "partials": len(partial),
+        "partial_bytes": sum(e["bytes"] for e in partial),
+    }
@@ -1,11 +1,17 @@
 import json
+import os
 import sys
 from pathlib import Path
 
 STORE_URL = "https://openmetro-src.creepernet.qzz.io"
 APPS_DIR = Path.home() / ".openmetro" / "apps"
 CACHE_DIR = Path.home() / ".openmetro" / "cache"
+STAGING_DIR = Path.home() / ".openmetro" / "staging"  # same volume as APPS_DIR so swaps are renames
+BLOB_DIR = Path.home() / ".openmetro" / "blobs"
+TRASH_DIR = Path.home() / ".openmetro" / "trash"  # removed app dirs awaiting background deletion
 CONFIG_FILE = Path.home() / ".openmetro" / "config.json"
+RUN_DIR = Path.home() / ".openmetro" / "run"  # one {"pid", "name"} file per running app
+RUNNER_HOST_KEY_FILE = Path.home() / ".openmetro" / "runner-host.key"  # IPC auth key of the shared runner host
 
 ACCENT = "#0078D4"
 BG = "#1E1E1E"
@@ -14,8 +20,38 @@ BG_HOVER = "#3D3D3D"
 FG = "#FFFFFF"
 FG_DIM = "#AAAAAA"
 FONT = "Segoe UI"
+CARD_HEIGHT = 92  # fixed so app lists can be virtualized
 
 CHUNK_SIZE = 8192
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+PARTIAL_MAX_AGE = 7 * 24 * 3600  # seconds before an untouched partial download is dropped
+CACHE_EVICT_INTERVAL = 60  # seconds between automatic eviction passes
+REGISTRY_MAX_AGE = 300  # seconds before the local registry is synced again
+REGISTRY_MAX_GAP = 50  # versions behind beyond which a full resync beats replaying change logs
+HTTP_POOL_SIZE = 16  # keep-alive connections per host, enough for segmented + parallel downloads
+DOWNLOAD_SEGMENTS = 4  # parallel range requests per download, 1 disables
+SEGMENT_MIN_SIZE = 4 * 1024 * 1024  # below this a single stream is faster
+PIECE_SIZE = 1024 * 1024  # resume/verify granularity when the store publishes no piece hashes
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+MAX_CONCURRENT_DOWNLOADS = 2
+BANDWIDTH_LIMIT = 0  # bytes/sec shared by all downloads, 0 for unlimited
+SEARCH_DEBOUNCE_MS = 150  # idle time after a keystroke before searching
+META_PREFETCH_WORKERS = 4  # concurrent metadata.json fetches for visible store apps
+META_PREFETCH_AHEAD = 10   # rows past the viewport whose metadata is prefetched
+RUNNER_POOL_SIZE = 1  # runners kept started and waiting so a launch skips interpreter/pywebview start-up
+RUNNER_SHARED_HOST = False  # open apps as windows of one shared runner process instead of one process each
+RUNNING_POLL_MS = 1000  # how often the Library checks RUN_DIR for apps starting or stopping
+MONITOR_INTERVAL = 2  # seconds between CPU/memory samples of running apps
+BACKGROUND_POLICY = "throttle"  # for apps minimized too long: "off" or "throttle" (idle CPU priority)
+BACKGROUND_AFTER = 60  # seconds minimized before BACKGROUND_POLICY applies
+MEMORY_LOW_BYTES = 512 * 1024 * 1024  # below this much free memory, background apps are closed, 0 disables
+PROGRESS_INTERVAL_MS = 100  # UI refresh rate for download progress
+PROGRESS_STEP = 0.5  # percent change worth redrawing
+DELTA_MAX_RATIO = 0.5  # above this share of changed bytes a full package download is cheaper
+ASSET_CACHE_BYTES = 64 * 1024 * 1024  # hot app files the local asset server keeps in memory
+ASSET_CACHE_MAX_FILE = 4 * 1024 * 1024  # bigger files (media) are streamed from disk instead
+PRECOMPRESS_MIN_SIZE = 1024  # smaller text assets aren't worth a gzip/brotli variant
+ASSET_SERVER_IDLE = 600  # seconds without requests or running apps before the asset server exits
 
 def get_base_path():
     """Returns the base path whether running frozen (PyInstaller) or as script."""
@@ -37,6 +73,37 @@ def get_runner_args(entry, name):
         runner = get_base_path() / "runner.py"
         return [sys.executable, str(runner), str(entry), name]
 
+def get_warm_runner_args():
+    """Args for a pre-started runner that waits on stdin for the app to open (see runner.warm)."""
+    if getattr(sys, "frozen", False):
+        return [sys.executable, "--run-warm"]
+    return [sys.executable, str(get_base_path() / "runner.py"), "--warm"]
+
+def get_asset_server_port():
+    """Fixed per-user port of the local asset server, so app origins (and their storage) are
+    the same on every launch."""
+    import getpass
+    import zlib
+    return 42100 + zlib.crc32(getpass.getuser().encode()) % 800
+
+def get_asset_server_args():
+    if getattr(sys, "frozen", False):
+        return [sys.executable, "--serve-assets"]
+    return [sys.executable, str(get_base_path() / "assets.py")]
+
+def get_runner_host_args(entry, name):
+    """Args to start the shared runner host with its first app (see runner.host)."""
+    if getattr(sys, "frozen", False):
+        return [sys.executable, "--run-host", str(entry), name]
+    return [sys.executable, str(get_base_path() / "runner.py"), "--host", str(entry), name]
+
+def get_runner_host_address():
+    """Local IPC address of the shared runner host: a named pipe on Windows, a socket elsewhere."""
+    if sys.platform == "win32":
+        import getpass
+        return rf"\\.\pipe\openmetro-runner-{getpass.getuser()}"
+    return str(Path.home() / ".openmetro" / "runner-host.sock")
+
 def load_config():
     if CONFIG_FILE.exists():
         return json.loads(CONFIG_FILE.read_text())
@@ -44,4 +111,6 @@ def load_config():
 
 def save_config(data):
     CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    CONFIG_FILE.write_text(json.dumps(data, indent=2))
+    tmp = CONFIG_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    os.replace(tmp, CONFIG_FILE)
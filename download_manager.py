@@ -0,0 +1,225 @@
+"""
+download_manager.py — one queue for every install/update, shared by the UI and headless tools.
+Jobs run as tasks on the engine loop (engine.download, over downloader.download_app), at most
+`workers` at a time in priority order, one per app id, under an optional global bandwidth cap.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+import downloader
+import engine
+from progress import ProgressTracker
+from config import MAX_CONCURRENT_DOWNLOADS, BANDWIDTH_LIMIT
+
+PRIORITY_HIGH = 0     # the app the user just clicked
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20     # background/unattended updates
+
+class DownloadJob:
+    def __init__(self, app_meta, priority):
+        self.app_meta = app_meta
+        self.app_id = app_meta["id"]
+        self.priority = priority
+        self.state = "queued"  # queued, running, paused, done, failed, cancelled
+        self.downloaded = 0
+        self.total = 0
+        self.resolve = None
+        self.result = None
+        self.error = None
+        self.cancel_flag = [False]
+        self._stop_reason = None
+        self._progress_callbacks = []
+        self._done_callbacks = []
+        self._finished = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running", "paused")
+
+    def wait(self, timeout=None):
+        """Blocks until the job finishes. Returns the installed app dir, or None."""
+        self._finished.wait(timeout)
+        return self.result
+
+class _Throttle:
+    """Token bucket shared by every running download."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._allowance = 0.0
+        self._last = time.monotonic()
+
+    def consume(self, n):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate) - n
+            self._last = now
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+class DownloadManager:
+    def __init__(self, workers=MAX_CONCURRENT_DOWNLOADS, bandwidth=BANDWIDTH_LIMIT):
+        self.workers = workers
+        self._throttle = _Throttle(bandwidth)
+        self.progress = ProgressTracker()  # coalesced per-app progress for UIs to poll
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._running = 0
+
+    # --- Public API ---
+
+    def submit(self, app_meta, priority=PRIORITY_NORMAL, on_progress=None, on_done=None, resolve=None):
+        """Queues an install/update. A second submit for the same app joins the existing job,
+        raising its priority if the new one is higher. on_progress(downloaded, total) is called
+        on the download's threads on every chunk, on_done(job) on the engine loop, so keep both
+        short; UIs should poll self.progress instead of passing on_progress. resolve(app_meta),
+        if given, is a coroutine function awaited before downloading that returns the metadata
+        to download with (e.g. engine.app_details)."""
+        with self._lock:
+            job = self._jobs.get(app_meta["id"])
+            if job is None or not job.active:
+                job = DownloadJob(app_meta, priority)
+                job.resolve = resolve
+                self._jobs[job.app_id] = job
+                self._push(job)
+            elif priority < job.priority:
+                job.priority = priority
+                if job.state == "queued":
+                    self._push(job)
+            if on_progress:
+                job._progress_callbacks.append(on_progress)
+            if on_done:
+                job._done_callbacks.append(on_done)
+            self._pump()
+        return job
+
+    def prioritize(self, app_id, priority=PRIORITY_HIGH):
+        with self._lock:
+            job = self._jobs.get(app_id)
+            if job and job.state == "queued" and priority < job.priority:
+                job.priority = priority
+                self._push(job)
+                self._pump()
+
+    def pause(self, app_id):
+        """Stops a job but keeps its partial download so resume() picks up where it left off."""
+        self._stop(app_id, "paused")
+
+    def resume(self, app_id):
+        with self._lock:
+            job = self._jobs.get(app_id)
+            if job and job.state == "paused":
+                job.state = "queued"
+                job.cancel_flag = [False]
+                self._push(job)
+                self._pump()
+
+    def cancel(self, app_id):
+        self._stop(app_id, "cancelled")
+
+    def set_bandwidth(self, bytes_per_sec):
+        self._throttle.rate = bytes_per_sec
+
+    def get(self, app_id):
+        return self._jobs.get(app_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    # --- Internals ---
+
+    def _push(self, job):
+        # Stale heap entries are skipped when popped, so re-pushing is how priority changes
+        heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+
+    def _pump(self):
+        """Starts queued jobs, best priority first, while there's room; caller holds the lock."""
+        while self._heap and self._running < self.workers:
+            priority, _, job = heapq.heappop(self._heap)
+            if job.state != "queued" or priority != job.priority:
+                continue
+            job.state = "running"
+            job._stop_reason = None
+            self._running += 1
+            engine.submit(self._run(job))
+
+    def _stop(self, app_id, reason):
+        with self._lock:
+            job = self._jobs.get(app_id)
+            if not job or not job.active:
+                return
+            if job.state == "running":
+                job._stop_reason = reason
+                job.cancel_flag[0] = True
+                return
+            job.state = reason
+        if reason == "cancelled":
+            downloader.discard_partial(app_id)
+            self._finish(job)
+
+    async def _run(self, job):
+        try:
+            await self._download(job)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pump()
+
+    async def _download(self, job):
+        lock = threading.Lock()
+        last = [None]
+
+        def on_progress(downloaded, total):
+            # Segmented downloads report from several threads, so only count forward movement;
+            # the first report may include bytes resumed from disk and isn't throttled
+            with lock:
+                delta = downloaded - last[0] if last[0] is not None else 0
+                if last[0] is None or delta > 0:
+                    last[0] = downloaded
+                    job.downloaded, job.total = downloaded, total
+            self.progress.update(job.app_id, downloaded, total)
+            if delta > 0:
+                self._throttle.consume(delta)
+            for cb in list(job._progress_callbacks):
+                cb(downloaded, total)
+
+        try:
+            if job.resolve:
+                job.app_meta = await job.resolve(job.app_meta)
+            job.result = await engine.download(job.app_meta, progress_callback=on_progress,
+                                               cancel_flag=job.cancel_flag)
+        except Exception as e:
+            job.error = e
+            job.state = "failed"
+            self._finish(job)
+            return
+
+        if job.result is None:
+            job.state = job._stop_reason or "cancelled"
+            if job.state == "paused":
+                self.progress.finish(job.app_id)
+                return
+            await asyncio.to_thread(downloader.discard_partial, job.app_id)
+        else:
+            job.state = "done"
+        self._finish(job)
+
+    def _finish(self, job):
+        self.progress.finish(job.app_id)
+        job._finished.set()
+        for cb in list(job._done_callbacks):
+            try:
+                cb(job)
+            except Exception as e:
+                print(f"Warning: download callback failed: {e}")
+
+manager = DownloadManager()
@@ -5,12 +5,24 @@ import json
 import sys
 import subprocess
 import tempfile
+import threading
+import shutil
+import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from config import APPS_DIR, CHUNK_SIZE, CACHE_DIR, get_runner_args, get_executable
+import assets
+import blobs
+import installed
+from net import session
+from config import (APPS_DIR, CHUNK_SIZE, CACHE_DIR, STAGING_DIR, TRASH_DIR, DOWNLOAD_SEGMENTS, SEGMENT_MIN_SIZE,
+                    PIECE_SIZE, EXTRACT_WORKERS, DELTA_MAX_RATIO, get_runner_args, get_executable)
 
 START_MENU = Path.home() / "AppData/Roaming/Microsoft/Windows/Start Menu/Programs/OpenMetro"
 
+# app_id -> {"files", "linked", "bytes", "seconds"} for the most recent extraction
+extract_stats = {}
+
 def register_start_menu(app_id, app_name, entry):
     if sys.platform != "win32":
         return
@@ -51,110 +63,516 @@ def unregister_start_menu(app_name):
     shortcut = START_MENU / f"{app_name}.lnk"
     shortcut.unlink(missing_ok=True)
 
-def _verify_checksum(file_path, expected_hash):
+def _file_sha256(file_path):
     sha = hashlib.sha256()
     with open(file_path, "rb") as f:
         for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
             sha.update(chunk)
-    return sha.hexdigest() == expected_hash
+    return sha.hexdigest()
 
-def download_app(app_meta, progress_callback=None, cancel_flag=None):
-    APPS_DIR.mkdir(parents=True, exist_ok=True)
-    tmp_path = CACHE_DIR / f"{app_meta['id']}.zip"
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+def _validator(headers):
+    """Returns a value usable in If-Range, preferring a strong ETag over Last-Modified."""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("last-modified")
 
-    url = app_meta["download"]
-    expected_hash = app_meta["checksum"].split(":")[1]
+def _probe(url):
+    """Returns (size, accepts_ranges, validator) for url, or (0, False, None) if the server won't say."""
+    try:
+        r = session.head(url, allow_redirects=True, timeout=10)
+        r.raise_for_status()
+    except requests.RequestException:
+        return 0, False, None
+    size = int(r.headers.get("content-length", 0))
+    return size, r.headers.get("accept-ranges", "").lower() == "bytes", _validator(r.headers)
 
-    headers = {}
-    downloaded = 0
+# --- Resume state ---
+# A partial download in CACHE_DIR/<id>.zip has a sidecar <id>.zip.state holding the
+# server validator and the SHA-256 of every piece already written, so a resume or a
+# repair knows which bytes are good without reading them back.
+
+def _state_path(tmp_path):
+    return tmp_path.with_name(tmp_path.name + ".state")
+
+def _load_state(tmp_path, url, piece_size):
+    path = _state_path(tmp_path)
+    if tmp_path.exists() and path.exists():
+        try:
+            state = json.loads(path.read_text())
+            if state["url"] == url and state["piece_size"] == piece_size:
+                return state
+        except Exception:
+            pass
+    # Bytes we can't vouch for are worthless - start clean
+    _clear_state(tmp_path)
+    return {"url": url, "validator": None, "size": 0, "piece_size": piece_size, "pieces": {}}
+
+def _save_state(tmp_path, state):
     if tmp_path.exists():
-        downloaded = tmp_path.stat().st_size
-        headers["Range"] = f"bytes={downloaded}-"
+        _state_path(tmp_path).write_text(json.dumps(state))
 
-    try:
-        with requests.get(url, headers=headers, stream=True, timeout=30) as r:
-            if r.status_code == 416:
-                tmp_path.unlink(missing_ok=True)
-                downloaded = 0
-                r = requests.get(url, stream=True, timeout=30)
-                r.raise_for_status()
+def _clear_state(tmp_path):
+    tmp_path.unlink(missing_ok=True)
+    _state_path(tmp_path).unlink(missing_ok=True)
 
-            r.raise_for_status()
-            total = int(r.headers.get("content-length", 0)) + downloaded
+def discard_partial(app_id):
+    """Drops a paused or abandoned partial download so the next attempt starts clean."""
+    _clear_state(CACHE_DIR / f"{app_id}.zip")
+
+def _verified_prefix(state):
+    """Returns the length of the run of verified pieces at the start of the file."""
+    n = 0
+    while str(n) in state["pieces"]:
+        n += 1
+    offset = n * state["piece_size"]
+    return min(offset, state["size"]) if state["size"] else offset
+
+def _bad_pieces(state, published):
+    return [i for i, digest in enumerate(published["sha256"]) if state["pieces"].get(str(i)) != digest]
+
+class _PieceWriter:
+    """Hashes bytes written sequentially from a piece-aligned offset, recording each finished piece."""
+
+    def __init__(self, state, offset):
+        self.state = state
+        self.offset = offset
+        self.sha = hashlib.sha256()
+
+    def update(self, chunk):
+        size = self.state["piece_size"]
+        while chunk:
+            part = chunk[:size - self.offset % size]
+            chunk = chunk[len(part):]
+            self.sha.update(part)
+            self.offset += len(part)
+            if self.offset % size == 0:
+                self._record()
+
+    def finish(self):
+        # Trailing short piece at end of file
+        if self.offset % self.state["piece_size"]:
+            self._record()
+
+    def _record(self):
+        index = (self.offset - 1) // self.state["piece_size"]
+        self.state["pieces"][str(index)] = self.sha.hexdigest()
+        self.sha = hashlib.sha256()
+
+def _download_stream(url, tmp_path, state, progress_callback, cancel_flag):
+    """Streams url from the end of the verified prefix. Returns (finished, sha256 hex or None);
+    the digest is only available when this call saw every byte of the file."""
+    offset = _verified_prefix(state)
+    if offset and offset == state["size"]:
+        return True, None
+    headers = {}
+    if offset and state["validator"]:
+        headers = {"Range": f"bytes={offset}-", "If-Range": state["validator"]}
+    else:
+        offset = 0
+
+    r = session.get(url, headers=headers, stream=True, timeout=30)
+    if r.status_code == 416:
+        r.close()
+        offset = 0
+        r = session.get(url, stream=True, timeout=30)
 
-            mode = "ab" if downloaded > 0 else "wb"
-            with open(tmp_path, mode) as f:
+    with r:
+        r.raise_for_status()
+        if r.status_code == 206:
+            if not r.headers.get("content-range", "").startswith(f"bytes {offset}-"):
+                raise requests.RequestException("server answered with the wrong range")
+        else:
+            # Full body: either no resume was asked for or the file changed under us
+            offset = 0
+        # Everything from offset on is rewritten, including pieces a segmented attempt recorded
+        # past the verified prefix - they must not outlive the truncate below
+        first = offset // state["piece_size"]
+        state["pieces"] = {k: v for k, v in state["pieces"].items() if int(k) < first}
+        state["validator"] = _validator(r.headers)
+        length = int(r.headers.get("content-length", 0))
+        total = offset + length if length else 0
+        state["size"] = total
+
+        sha = hashlib.sha256() if offset == 0 else None
+        writer = _PieceWriter(state, offset)
+        downloaded = offset
+        with open(tmp_path, "r+b" if offset else "wb") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if cancel_flag and cancel_flag[0]:
+                    return False, None
+                f.write(chunk)
+                writer.update(chunk)
+                if sha:
+                    sha.update(chunk)
+                downloaded += len(chunk)
+                if progress_callback:
+                    progress_callback(downloaded, total)
+        writer.finish()
+    return True, sha.hexdigest() if sha else None
+
+def _piece_runs(missing, segments):
+    """Groups missing piece indexes into at most ~`segments` contiguous (first, last) runs."""
+    per_run = max(1, -(-len(missing) // segments))
+    runs = []
+    for i in missing:
+        if runs and runs[-1][1] == i - 1 and runs[-1][1] - runs[-1][0] + 1 < per_run:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return runs
+
+def _download_segmented(url, tmp_path, state, total, segments, progress_callback, cancel_flag):
+    """Fetches every piece not yet in `state` as parallel byte ranges into a preallocated file."""
+    size = state["piece_size"]
+    missing = [i for i in range(-(-total // size)) if str(i) not in state["pieces"]]
+    with open(tmp_path, "r+b" if tmp_path.exists() else "wb") as f:
+        f.truncate(total)
+
+    lock = threading.Lock()
+    abort = threading.Event()
+    downloaded = [total - sum(min(size, total - i * size) for i in missing)]
+
+    def fetch(first, last):
+        start, end = first * size, min((last + 1) * size, total) - 1
+        headers = {"Range": f"bytes={start}-{end}"}
+        if state["validator"]:
+            headers["If-Range"] = state["validator"]
+        with session.get(url, headers=headers, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise requests.RequestException("server ignored range request")
+            writer = _PieceWriter(state, start)
+            with open(tmp_path, "r+b") as f:
+                f.seek(start)
+                pos = start
                 for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
-                    if cancel_flag and cancel_flag[0]:
-                        return None
+                    if abort.is_set() or (cancel_flag and cancel_flag[0]):
+                        return
+                    chunk = chunk[:end + 1 - pos]
                     f.write(chunk)
-                    downloaded += len(chunk)
+                    writer.update(chunk)
+                    pos += len(chunk)
+                    with lock:
+                        downloaded[0] += len(chunk)
+                        done = downloaded[0]
                     if progress_callback:
-                        progress_callback(downloaded, total)
-    except requests.RequestException as e:
-        raise ConnectionError(f"Download failed: {e}")
+                        progress_callback(done, total)
+            if pos == total:
+                writer.finish()
 
-    if not _verify_checksum(tmp_path, expected_hash):
-        tmp_path.unlink(missing_ok=True)
-        raise ValueError("Checksum mismatch — file corrupted. Please try again.")
+    with ThreadPoolExecutor(max_workers=max(1, min(segments, len(missing)))) as pool:
+        futures = [pool.submit(fetch, first, last) for first, last in _piece_runs(missing, segments)]
+        try:
+            for fut in futures:
+                fut.result()
+        except Exception:
+            abort.set()
+            raise
 
-    app_dir = APPS_DIR / app_meta["id"]
-    app_dir.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(tmp_path) as z:
-        z.extractall(app_dir)
-    tmp_path.unlink(missing_ok=True)
+    return not (cancel_flag and cancel_flag[0])
 
-    entry = app_meta.get("entry", "index.html")
+def _safe_target(root, name):
+    """Resolves a package-relative path under root, refusing anything that escapes it."""
+    target = (root / name).resolve()
+    if target != root and root not in target.parents:
+        raise ValueError(f"Unsafe path in package: {name}")
+    return target
+
+def _extract_parallel(zip_path, dest, app_id):
+    """Extracts zip_path into a fresh dest, decompressing members across a thread pool.
+    Returns the per-file table {path: {"size", "sha256"}} recorded in manifest.json."""
+    shutil.rmtree(dest, ignore_errors=True)
+    dest.mkdir(parents=True)
+    started = time.perf_counter()
+
+    with zipfile.ZipFile(zip_path) as z:
+        members = [m for m in z.infolist() if not m.is_dir()]
+        root = dest.resolve()
+        for m in z.infolist():
+            target = _safe_target(root, m.filename)
+            # Create every directory up front so workers never race on makedirs
+            (target if m.is_dir() else target.parent).mkdir(parents=True, exist_ok=True)
+
+    files = {}
+
+    linked = [0]
+
+    def extract(bucket):
+        # ZipFile handles aren't safe to share between threads, so each worker opens its own
+        with zipfile.ZipFile(zip_path) as z:
+            for member in bucket:
+                target = _safe_target(root, member.filename)
+                # Every member is hashed from its own content; a file another app already
+                # installed is then swapped for a link to the shared blob
+                target.unlink(missing_ok=True)  # a repeated member name mustn't write through a link
+                sha = hashlib.sha256()
+                with z.open(member) as src, open(target, "wb") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE * 8), b""):
+                        dst.write(chunk)
+                        sha.update(chunk)
+                digest = sha.hexdigest()
+                if blobs.ingest(target, digest):
+                    linked[0] += 1
+                files[Path(member.filename).as_posix()] = {"size": member.file_size, "sha256": digest}
+
+    # Deal members out biggest-first so the workers finish at about the same time
+    members.sort(key=lambda m: m.file_size, reverse=True)
+    buckets = [members[i::EXTRACT_WORKERS] for i in range(EXTRACT_WORKERS)]
+    with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as pool:
+        list(pool.map(extract, [b for b in buckets if b]))
+
+    extract_stats[app_id] = {
+        "files": len(members),
+        "linked": linked[0],
+        "bytes": sum(m.file_size for m in members),
+        "seconds": time.perf_counter() - started,
+    }
+    print(f"Extracted {app_id}: {len(members)} files ({linked[0]} shared) in {extract_stats[app_id]['seconds']:.2f}s")
+    return files
+
+def _trash(app_dir, shas=None):
+    """Renames app_dir out of APPS_DIR at once and deletes it on a background thread,
+    then frees blobs nothing links to any more (only `shas` if given)."""
+    TRASH_DIR.mkdir(parents=True, exist_ok=True)
+    trashed = TRASH_DIR / f"{app_dir.name}-{time.time_ns()}"
+    app_dir.rename(trashed)
+
+    def remove():
+        shutil.rmtree(trashed, ignore_errors=True)
+        blobs.collect(shas)
+    threading.Thread(target=remove, daemon=True).start()
+
+def empty_trash():
+    """Deletes app dirs left in the trash by a previous run that exited mid-delete."""
+    if TRASH_DIR.exists():
+        for leftover in TRASH_DIR.iterdir():
+            shutil.rmtree(leftover, ignore_errors=True)
+        blobs.collect()
+
+def _swap_in(staging, app_dir):
+    """Moves a fully prepared staging dir into place and deletes the old version in the background."""
+    if app_dir.exists():
+        try:
+            _trash(app_dir)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise PermissionError(f"Could not replace '{app_dir.name}' while it is in use. Close it and try again.")
+    staging.rename(app_dir)
+
+def _write_manifest(app_meta, dest, files):
     manifest = {
         "id": app_meta["id"],
         "name": app_meta["name"],
         "version": app_meta["version"],
         "author": app_meta.get("author", ""),
         "description": app_meta.get("description", ""),
-        "entry": entry,
+        "entry": app_meta.get("entry", "index.html"),
+        "files": files,
     }
-    (app_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    # Replace rather than write in place: a package's own manifest.json may be a hard link
+    # to a blob shared with other apps
+    tmp = dest / "manifest.json.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, dest / "manifest.json")
+    return manifest
+
+def _delta_update(app_meta, progress_callback=None, cancel_flag=None):
+    """Updates an installed app by fetching only files whose hash changed.
+
+    Needs app_meta["delta"] = {"manifest": <url of {path: {"size", "sha256"}}>, "base": <url prefix>}
+    and a local manifest with a "files" table. Returns the app dir, None if cancelled, or
+    False when a delta isn't possible or worthwhile and the full package should be used."""
+    app_dir = APPS_DIR / app_meta["id"]
+    local = (installed.index.get(app_meta["id"]) or {}).get("files")
+    if not local:
+        return False
+
+    delta = app_meta["delta"]
+    try:
+        r = session.get(delta["manifest"], timeout=10)
+        r.raise_for_status()
+        remote = r.json()
+    except (requests.RequestException, ValueError):
+        return False
+
+    changed = [path for path, info in remote.items() if local.get(path) != info]
+    changed_bytes = sum(remote[path]["size"] for path in changed)
+    if changed_bytes > DELTA_MAX_RATIO * sum(info["size"] for info in remote.values()):
+        return False
+
+    staging = STAGING_DIR / app_meta["id"]
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    root = staging.resolve()
+
+    def reuse(path):
+        # Hard-link from the live copy; the live dir is only ever renamed away, never edited
+        target = _safe_target(root, path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(app_dir / path, target)
+        except OSError:
+            shutil.copy2(app_dir / path, target)
 
-    register_start_menu(app_meta["id"], app_meta["name"], app_dir / entry)
+    lock = threading.Lock()
+    downloaded = [0]
+
+    def fetch(path):
+        target = _safe_target(root, path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if blobs.link(remote[path]["sha256"], target):
+            return
+        sha = hashlib.sha256()
+        with session.get(f"{delta['base'].rstrip('/')}/{path}", stream=True, timeout=30) as r:
+            r.raise_for_status()
+            target.unlink(missing_ok=True)  # never write through a link into a shared blob
+            with open(target, "wb") as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    if cancel_flag and cancel_flag[0]:
+                        return
+                    f.write(chunk)
+                    sha.update(chunk)
+                    with lock:
+                        downloaded[0] += len(chunk)
+                        done = downloaded[0]
+                    if progress_callback:
+                        progress_callback(done, changed_bytes)
+        if sha.hexdigest() != remote[path]["sha256"]:
+            raise ValueError(f"Checksum mismatch for {path}")
+        blobs.ingest(target, remote[path]["sha256"])
+
+    try:
+        for path in remote.keys() - set(changed):
+            reuse(path)
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_SEGMENTS) as pool:
+            list(pool.map(fetch, changed))
+    except (requests.RequestException, ValueError, OSError) as e:
+        print(f"Delta update failed, falling back to full download: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    if cancel_flag and cancel_flag[0]:
+        shutil.rmtree(staging, ignore_errors=True)
+        return None
+
+    assets.precompress(staging, remote, reuse_from=app_dir)
+    manifest = _write_manifest(app_meta, staging, remote)
+    _swap_in(staging, app_dir)
+    installed.index.update(app_meta["id"], manifest)
+    register_start_menu(app_meta["id"], app_meta["name"], app_dir / manifest["entry"])
+    print(f"Delta updated {app_meta['id']}: {len(changed)} of {len(remote)} files, {changed_bytes} bytes")
+    return app_dir
+
+def download_app(app_meta, progress_callback=None, cancel_flag=None, segments=None):
+    if app_meta.get("delta") and is_update_available(app_meta):
+        result = _delta_update(app_meta, progress_callback, cancel_flag)
+        if result is not False:
+            return result
+
+    APPS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_DIR / f"{app_meta['id']}.zip"
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    url = app_meta["download"]
+    expected_hash = app_meta["checksum"].split(":")[1]
+    if segments is None:
+        segments = DOWNLOAD_SEGMENTS
+
+    # Optional {"size": <bytes>, "sha256": [<hex>, ...]} published alongside the checksum
+    published = app_meta.get("pieces")
+    state = _load_state(tmp_path, url, published["size"] if published else PIECE_SIZE)
+    total, ranged, validator = 0, False, None
+    digest = None
+    try:
+        if segments > 1 or published:
+            total, ranged, validator = _probe(url)
+        if validator and state["validator"] not in (None, validator):
+            _clear_state(tmp_path)
+            state = _load_state(tmp_path, url, state["piece_size"])
+        if segments > 1 and ranged and total >= SEGMENT_MIN_SIZE:
+            state["validator"], state["size"] = validator, total
+            try:
+                done = _download_segmented(url, tmp_path, state, total, segments, progress_callback, cancel_flag)
+            except requests.RequestException:
+                # Server lied about ranges or a segment failed - carry on as one stream
+                done, digest = _download_stream(url, tmp_path, state, progress_callback, cancel_flag)
+        else:
+            done, digest = _download_stream(url, tmp_path, state, progress_callback, cancel_flag)
+        if not done:
+            return None
+
+        if published:
+            bad = _bad_pieces(state, published)
+            if bad and ranged:
+                # Re-fetch only the pieces that don't match
+                for i in bad:
+                    state["pieces"].pop(str(i), None)
+                if not _download_segmented(url, tmp_path, state, state["size"], segments, None, cancel_flag):
+                    return None
+                digest = None
+                bad = _bad_pieces(state, published)
+            if bad:
+                _clear_state(tmp_path)
+                raise ValueError("Checksum mismatch — file corrupted. Please try again.")
+    except requests.RequestException as e:
+        raise ConnectionError(f"Download failed: {e}")
+    finally:
+        _save_state(tmp_path, state)
+
+    # When every piece checked out against the store there's nothing left to read back
+    if digest is None and not published:
+        digest = _file_sha256(tmp_path)
+    if digest is not None and digest != expected_hash:
+        _clear_state(tmp_path)
+        raise ValueError("Checksum mismatch — file corrupted. Please try again.")
+
+    app_dir = APPS_DIR / app_meta["id"]
+    staging = STAGING_DIR / app_meta["id"]
+    files = _extract_parallel(tmp_path, staging, app_meta["id"])
+    _clear_state(tmp_path)
+
+    assets.precompress(staging, files)  # gzip/brotli variants for the local asset server
+    manifest = _write_manifest(app_meta, staging, files)
+    _swap_in(staging, app_dir)
+    installed.index.update(app_meta["id"], manifest)
+
+    register_start_menu(app_meta["id"], app_meta["name"], app_dir / manifest["entry"])
 
     return app_dir
 
 
 def get_installed_apps():
     APPS_DIR.mkdir(parents=True, exist_ok=True)
-    apps = []
-    for manifest in APPS_DIR.glob("*/manifest.json"):
-        try:
-            apps.append(json.loads(manifest.read_text()))
-        except Exception:
-            pass
-    return apps
+    installed.index.revalidate()
+    return installed.index.all()
 
 
 def uninstall_app(app_id):
-    import shutil
     app_dir = APPS_DIR / app_id
     if app_dir.exists():
-        manifest_path = app_dir / "manifest.json"
-        if manifest_path.exists():
-            try:
-                manifest = json.loads(manifest_path.read_text())
-                unregister_start_menu(manifest["name"])
-            except Exception:
-                pass
-        shutil.rmtree(app_dir)
+        manifest = installed.index.get(app_id) or {}
+        try:
+            unregister_start_menu(manifest["name"])
+        except Exception:
+            pass
+        shas = [f["sha256"] for f in manifest.get("files", {}).values()] if manifest.get("files") else None
+        try:
+            _trash(app_dir, shas)
+        except OSError:
+            raise PermissionError(f"Could not uninstall '{manifest.get('name', app_id)}' while it is in use. Close it and try again.")
+        installed.index.remove(app_id)
         return True
     return False
 
 
 def is_update_available(store_meta):
-    manifest = APPS_DIR / store_meta["id"] / "manifest.json"
-    if not manifest.exists():
+    local = installed.index.get(store_meta["id"])
+    if local is None:
         return False
-    local = json.loads(manifest.read_text())
-    return local["version"] != store_meta["version"]
+    return local.version != store_meta["version"]
 
 
 def is_installed(app_id):
-    return (APPS_DIR / app_id / "manifest.json").exists()
+    return installed.index.get(app_id) is not None
@@ -0,0 +1,80 @@
+"""
+engine.py — one background asyncio loop for the client's network and hashing work.
+The registry load, metadata prefetching (prefetch.MetaPrefetcher) and the download queue
+(download_manager.DownloadManager) all schedule their work here as tasks, so the loop owns
+their ordering, limits and cancellation. The blocking pieces underneath - the pooled
+requests session and downloader.download_app with its ranged segments and inline sha256
+checks - run on the loop's bounded executor, and stay callable directly as shims.
+
+submit() is the bridge in: call it from any thread, including the Tk mainloop, and get
+on_done/on_error back on the Tk thread.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import downloader
+import store
+from config import HTTP_POOL_SIZE
+
+_loop = None
+_lock = threading.Lock()
+
+def get_loop():
+    """Returns the engine loop, starting its thread on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="engine"))
+            threading.Thread(target=loop.run_forever, name="engine-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+def submit(coro, widget=None, on_done=None, on_error=None):
+    """Schedules coro on the engine loop and returns a concurrent.futures.Future. With a
+    widget, on_done(result) / on_error(exc) are called on its Tk thread; without one they
+    run on the loop thread. Cancelling the future cancels the coroutine."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+    def deliver(f):
+        if f.cancelled():
+            return
+        error = f.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"Warning: engine task failed: {error}")
+        elif on_done:
+            on_done(f.result())
+
+    if widget is not None:
+        future.add_done_callback(lambda f: widget.after(0, lambda: deliver(f)))
+    else:
+        future.add_done_callback(deliver)
+    return future
+
+# --- Store ---
+
+async def fetch_registry(on_refresh=None):
+    return await asyncio.to_thread(store.fetch_registry, on_refresh)
+
+async def app_details(app):
+    """Async store.app_details: app overlaid with its metadata, awaiting the prefetcher."""
+    return store.with_meta(app, await store.meta_prefetcher.resolve_async(app["id"]))
+
+# --- Downloads ---
+
+async def download(app_meta, progress_callback=None, cancel_flag=None):
+    """Installs or updates an app (ranged, resumable, checksum-verified - see
+    downloader.download_app). Cancelling the task stops the download at its next chunk
+    and keeps the partial file for a later resume. Returns the app dir, or None."""
+    cancel_flag = cancel_flag if cancel_flag is not None else [False]
+    loop = asyncio.get_running_loop()
+    work = loop.run_in_executor(None, downloader.download_app, app_meta, progress_callback, cancel_flag)
+    try:
+        return await asyncio.shield(work)
+    except asyncio.CancelledError:
+        cancel_flag[0] = True
+        await asyncio.wait([work])  # let the worker notice the flag and close its files
+        raise
@@ -0,0 +1,29 @@
+"""
+fsops.py — runs filesystem work off the Tk thread.
+The UI submits a job and gets its result back through a callback scheduled on the
+Tk mainloop, so manifest scans and uninstalls never freeze the window.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fsops")
+
+def submit(fn, *args, widget=None, on_done=None, on_error=None):
+    """Runs fn(*args) in the background. With a widget, on_done(result) / on_error(exc)
+    are called on its Tk thread; without one they run on the worker."""
+    future = _executor.submit(fn, *args)
+
+    def deliver(f):
+        error = f.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"Warning: background job {getattr(fn, '__name__', fn)} failed: {error}")
+        elif on_done:
+            on_done(f.result())
+
+    if widget is not None:
+        future.add_done_callback(lambda f: widget.after(0, lambda: deliver(f)))
+    else:
+        future.add_done_callback(deliver)
+    return future
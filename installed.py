@@ -0,0 +1,96 @@
+"""
+installed.py — in-memory index of installed app manifests.
+Loaded once, kept current by downloader's install/uninstall calls, and revalidated
+against directory mtimes so a refresh only re-reads manifests that actually changed.
+Lookups never touch the disk.
+"""
+import json
+import os
+import threading
+from config import APPS_DIR
+from records import AppRecord
+
+class InstalledIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._manifests = {}  # app_id -> manifest AppRecord
+        self._mtimes = {}     # app_id -> app dir mtime when its manifest was read
+        self._root_mtime = None
+
+    def revalidate(self):
+        """Brings the index in line with APPS_DIR. Costs one stat when nothing changed."""
+        try:
+            root_mtime = APPS_DIR.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._manifests, self._mtimes, self._root_mtime = {}, {}, None
+            return
+        if root_mtime == self._root_mtime:
+            return
+
+        manifests, mtimes = {}, {}
+        with os.scandir(APPS_DIR) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                mtime = entry.stat().st_mtime_ns
+                if self._mtimes.get(entry.name) == mtime:
+                    manifests[entry.name] = self._manifests[entry.name]
+                    mtimes[entry.name] = mtime
+                    continue
+                try:
+                    manifest = AppRecord.from_dict(json.loads((APPS_DIR / entry.name / "manifest.json").read_text()))
+                except Exception:
+                    continue
+                manifests[entry.name] = manifest
+                mtimes[entry.name] = mtime
+        with self._lock:
+            self._manifests, self._mtimes, self._root_mtime = manifests, mtimes, root_mtime
+
+    def _ensure_loaded(self):
+        if self._root_mtime is None:
+            self.revalidate()
+
+    def update(self, app_id, manifest):
+        self._ensure_loaded()
+        with self._lock:
+            self._manifests[app_id] = AppRecord.from_dict(manifest)
+            try:
+                self._mtimes[app_id] = (APPS_DIR / app_id).stat().st_mtime_ns
+                self._root_mtime = APPS_DIR.stat().st_mtime_ns
+            except OSError:
+                self._root_mtime = None  # rescan next time
+
+    def remove(self, app_id):
+        self._ensure_loaded()
+        with self._lock:
+            self._manifests.pop(app_id, None)
+            self._mtimes.pop(app_id, None)
+            try:
+                self._root_mtime = APPS_DIR.stat().st_mtime_ns
+            except OSError:
+                self._root_mtime = None
+
+    def get(self, app_id):
+        self._ensure_loaded()
+        return self._manifests.get(app_id)
+
+    def all(self):
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._manifests.values())
+
+    def status(self, store_metas, load=True):
+        """Batch lookup: {app_id: (installed, has_update)} for a page of store entries.
+        With load=False an index that hasn't been loaded yet reports nothing installed
+        instead of scanning APPS_DIR on the caller's thread."""
+        if load:
+            self._ensure_loaded()
+        manifests = self._manifests
+        result = {}
+        for meta in store_metas:
+            local = manifests.get(meta["id"])
+            result[meta["id"]] = (local is not None, local is not None and local.version != meta["version"])
+        return result
+
+index = InstalledIndex()
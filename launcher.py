@@ -1,9 +1,95 @@
 import json
+import os
 import subprocess
+import threading
+import time
 from pathlib import Path
-from config import APPS_DIR, get_runner_args
+import running
+from monitor import monitor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from config import (APPS_DIR, RUNNER_POOL_SIZE, RUNNER_SHARED_HOST, RUNNER_HOST_KEY_FILE,
+                    get_runner_args, get_warm_runner_args, get_runner_host_args, get_runner_host_address)
+
+class RunnerPool:
+    """Keeps a few runner processes started and waiting, with pywebview already imported.
+
+    A launch hands one of them {"entry", "name", "launched_at"} over its stdin pipe and a
+    replacement is started in the background. Warm runners exit on their own when the
+    client does, since their stdin closes."""
+
+    def __init__(self, size=RUNNER_POOL_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = []
+        self._starting = 0
+
+    def fill(self):
+        with self._lock:
+            self._idle = [p for p in self._idle if p.poll() is None]
+            missing = self.size - len(self._idle) - self._starting
+            self._starting += max(missing, 0)
+        for _ in range(missing):
+            try:
+                proc = subprocess.Popen(get_warm_runner_args(), stdin=subprocess.PIPE, close_fds=True)
+            except OSError as e:
+                proc = None
+                print(f"Warning: could not start a warm runner: {e}")
+            with self._lock:
+                self._starting -= 1
+                if proc is not None:
+                    self._idle.append(proc)
+
+    def launch(self, entry, name, launched_at):
+        """Hands the app to a waiting runner and returns its process, or None if none was available."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                proc = self._idle.pop(0)
+            if proc.poll() is not None:
+                continue
+            try:
+                proc.stdin.write((json.dumps({"entry": str(entry), "name": name,
+                                              "launched_at": launched_at}) + "\n").encode())
+                proc.stdin.close()
+            except OSError:
+                continue  # died between poll() and the write - try the next one
+            threading.Thread(target=self.fill, daemon=True).start()
+            return proc
+
+pool = RunnerPool()
+
+def _open_in_host(entry, name, launched_at):
+    """Asks a running shared host to open the app as another window. False if there's no
+    host, or it's shutting down and didn't confirm."""
+    try:
+        key = RUNNER_HOST_KEY_FILE.read_bytes()
+        with Client(get_runner_host_address(), authkey=key) as conn:
+            conn.send({"entry": str(entry), "name": name, "launched_at": launched_at})
+            return conn.poll(5) and conn.recv() == "ok"
+    except (OSError, EOFError, AuthenticationError):
+        return False
+
+def _track(app_id, proc, name):
+    """Records proc as running app_id until it exits, so a second launch focuses it instead."""
+    running.index.mark(app_id, proc.pid, name)
+
+    def wait():
+        proc.wait()
+        running.index.clear_pid(proc.pid)  # also covers a runner that crashed before cleaning up
+
+    threading.Thread(target=wait, daemon=True).start()
 
 def launch_app(app_id):
+    launched_at = time.time()
+    record = running.index.get(app_id)
+    if record is not None:
+        # Already running - never start a second copy
+        monitor.wake(record)  # undo any background throttling/suspension first
+        if not running.focus(record):
+            raise RuntimeError(f"{record['name']} is already running, but its window couldn't be brought to the front.")
+        return
     app_dir = APPS_DIR / app_id
     manifest_path = app_dir / "manifest.json"
 
@@ -16,5 +102,16 @@ def launch_app(app_id):
     if not entry.exists():
         raise FileNotFoundError(f"App entry point not found: {entry}")
 
-    args = get_runner_args(entry, manifest["name"])
-    subprocess.Popen(args, close_fds=True)
+    env = dict(os.environ, OPENMETRO_LAUNCHED_AT=str(launched_at))
+    name = manifest["name"]
+    if RUNNER_SHARED_HOST:
+        if not _open_in_host(entry, name, launched_at):  # the host records its windows itself
+            _track(app_id, subprocess.Popen(get_runner_host_args(entry, name), close_fds=True, env=env), name)
+        return
+
+    proc = pool.launch(entry, name, launched_at)
+    if proc is None:
+        # No warm runner - start one cold, and refill the pool for next time
+        proc = subprocess.Popen(get_runner_args(entry, name), close_fds=True, env=env)
+        threading.Thread(target=pool.fill, daemon=True).start()
+    _track(app_id, proc, name)
@@ -1,6 +1,26 @@
 import sys
 import os
 
+# --- Warm runner mode (pre-started by launcher.RunnerPool, waits on stdin for an app) ---
+if "--run-warm" in sys.argv:
+    from runner import warm
+    warm()
+    sys.exit(0)
+
+# --- Local asset server mode (started on demand by runners) ---
+if "--serve-assets" in sys.argv:
+    import assets
+    assets.main()
+    sys.exit(0)
+
+# --- Shared runner host mode (one process owning every app window) ---
+if "--run-host" in sys.argv:
+    idx = sys.argv.index("--run-host")
+    if len(sys.argv) >= idx + 3:
+        import runner
+        runner.host(sys.argv[idx + 1], sys.argv[idx + 2], runner._launched_at())
+    sys.exit(0)
+
 # --- Runner mode (launched as subprocess to open an app fullscreen) ---
 if "--run" in sys.argv:
     idx = sys.argv.index("--run")
@@ -120,8 +140,21 @@ class OpenMetroClient(tk.Tk):
 
 
 def main():
-    app = OpenMetroClient()
-    app.mainloop()
+    import cache
+    import downloader
+    import fsops
+    cache.maybe_evict()  # trim CACHE_DIR in the background while the window comes up
+    import launcher
+    from monitor import monitor
+    fsops.submit(downloader.empty_trash)
+    if not RUNNER_SHARED_HOST:
+        fsops.submit(launcher.pool.fill)  # warm runners start while the window comes up
+    monitor.start()
+    try:
+        app = OpenMetroClient()
+        app.mainloop()
+    finally:
+        monitor.stop()  # don't leave apps at idle priority once nothing will restore them
 
 if __name__ == "__main__":
     main()
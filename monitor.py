@@ -0,0 +1,253 @@
+"""
+monitor.py — CPU/memory accounting for running apps and what happens to ones left in the
+background. Every MONITOR_INTERVAL seconds the client samples each runner process listed in
+running.index, then applies BACKGROUND_POLICY to apps minimized for longer than
+BACKGROUND_AFTER and, when available memory drops below MEMORY_LOW_BYTES, closes the
+longest-backgrounded apps first.
+
+An app is un-throttled as soon as its runner reports the window back in front (however it
+was restored - taskbar, Alt-Tab or Launch), and every app still throttled is restored when
+the client exits. Apps are never suspended outright: a stopped process can't repaint or even
+notice its window being restored.
+
+Uses psutil when it's installed, otherwise the Win32 API or /proc. A process hosting several
+apps (shared host mode) is measured but never throttled or closed.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+import running
+from config import MONITOR_INTERVAL, BACKGROUND_POLICY, BACKGROUND_AFTER, MEMORY_LOW_BYTES
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# --- Platform helpers ---
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    class _MemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                   [(f, ctypes.c_size_t) for f in ("PeakWorkingSetSize", "WorkingSetSize",
+                    "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                    "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+    class _MemoryStatus(ctypes.Structure):
+        _fields_ = [("dwLength", wintypes.DWORD), ("dwMemoryLoad", wintypes.DWORD)] + \
+                   [(f, ctypes.c_ulonglong) for f in ("ullTotalPhys", "ullAvailPhys", "ullTotalPageFile",
+                    "ullAvailPageFile", "ullTotalVirtual", "ullAvailVirtual", "ullAvailExtendedVirtual")]
+
+    def _open(pid, access):
+        return ctypes.windll.kernel32.OpenProcess(access, False, pid)
+
+def _sample(pid):
+    """Returns (cpu seconds used so far, resident bytes) for pid, or None."""
+    try:
+        if psutil:
+            proc = psutil.Process(pid)
+            times = proc.cpu_times()
+            return times.user + times.system, proc.memory_info().rss
+        if sys.platform == "win32":
+            handle = _open(pid, 0x1000 | 0x0010)  # QUERY_LIMITED_INFORMATION | VM_READ
+            if not handle:
+                return None
+            try:
+                created, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+                ctypes.windll.kernel32.GetProcessTimes(handle, ctypes.byref(created), ctypes.byref(exited),
+                                                       ctypes.byref(kernel), ctypes.byref(user))
+                counters = _MemoryCounters(cb=ctypes.sizeof(_MemoryCounters))
+                ctypes.windll.kernel32.K32GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+            finally:
+                ctypes.windll.kernel32.CloseHandle(handle)
+            ticks = sum((t.dwHighDateTime << 32 | t.dwLowDateTime) for t in (kernel, user))
+            return ticks / 1e7, counters.WorkingSetSize
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        return cpu, int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+def _available_memory():
+    try:
+        if psutil:
+            return psutil.virtual_memory().available
+        if sys.platform == "win32":
+            status = _MemoryStatus(dwLength=ctypes.sizeof(_MemoryStatus))
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullAvailPhys
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return None
+
+def _set_throttled(pid, throttled):
+    """Drops pid to the lowest CPU priority, or back to normal."""
+    if psutil:
+        low = psutil.IDLE_PRIORITY_CLASS if sys.platform == "win32" else 19
+        normal = psutil.NORMAL_PRIORITY_CLASS if sys.platform == "win32" else 0
+        psutil.Process(pid).nice(low if throttled else normal)
+    elif sys.platform == "win32":
+        handle = _open(pid, 0x0200)  # PROCESS_SET_INFORMATION
+        if handle:
+            ctypes.windll.kernel32.SetPriorityClass(handle, 0x40 if throttled else 0x20)  # IDLE / NORMAL
+            ctypes.windll.kernel32.CloseHandle(handle)
+    else:
+        # Unprivileged users can't lower niceness again, so un-throttling may be refused
+        os.setpriority(os.PRIO_PROCESS, pid, 19 if throttled else 0)
+
+# --- Monitor ---
+
+class ResourceMonitor:
+    def __init__(self, interval=MONITOR_INTERVAL, policy=BACKGROUND_POLICY,
+                 background_after=BACKGROUND_AFTER, memory_low=MEMORY_LOW_BYTES):
+        self.interval = interval
+        self.policy = policy  # "off" or "throttle"
+        self.background_after = background_after
+        self.memory_low = memory_low
+        self.version = 0  # bumped after every sample, for UIs deciding whether to redraw
+        self._lock = threading.Lock()
+        self._usage = {}    # app_id -> (cpu percent, rss bytes)
+        self._last = {}     # pid -> (monotonic time, cpu seconds)
+        self._parked = {}   # pid -> running.index record of a process we throttled
+        self._woken = {}    # pid -> wall time it was brought back to the front
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def usage(self, app_id):
+        """(cpu percent, rss bytes) of the process running app_id, or None."""
+        return self._usage.get(app_id)
+
+    def wake(self, record):
+        """Undoes any throttling of the process in a running.index record. Called before the
+        client focuses an app, and by sample() once the app's window is back in front."""
+        pid = record["pid"]
+        with self._lock:
+            self._woken[pid] = time.time()
+            parked = self._parked.pop(pid, None)
+        self._unpark(parked)
+
+    def stop(self):
+        """Restores every app we throttled; nothing is parked after this. Called on client exit."""
+        with self._lock:
+            self._stopped = True
+            parked, self._parked = list(self._parked.values()), {}
+        for record in parked:
+            self._unpark(record)
+
+    def _unpark(self, record):
+        if record is None or not running.same_process(record):
+            return  # never parked by us, or exited and its pid was reused
+        try:
+            _set_throttled(record["pid"], False)
+        except Exception as e:
+            print(f"Warning: could not restore process {record['pid']}: {e}")
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Warning: resource monitor pass failed: {e}")
+            time.sleep(self.interval)
+
+    def sample(self):
+        apps = running.index.refresh_all()
+        now, wall = time.monotonic(), time.time()
+        apps_per_pid = {}
+        for record in apps.values():
+            apps_per_pid[record["pid"]] = apps_per_pid.get(record["pid"], 0) + 1
+
+        usage, last = {}, {}
+        for app_id, record in apps.items():
+            pid = record["pid"]
+            if pid not in last:
+                sample = _sample(pid)
+                if sample is None:
+                    continue
+                prev = self._last.get(pid)
+                cpu = 0.0
+                if prev and now > prev[0]:
+                    cpu = max(0.0, (sample[0] - prev[1]) / (now - prev[0]) * 100)
+                last[pid] = (now, sample[0], cpu, sample[1])
+            usage[app_id] = last[pid][2:]
+        self._usage = usage
+        self._last = {pid: entry[:2] for pid, entry in last.items()}
+        with self._lock:
+            started = {record["pid"]: record.get("started") for record in apps.values()}
+            self._parked = {pid: parked for pid, parked in self._parked.items()
+                            if pid in last and parked.get("started") == started.get(pid)}
+            self._woken = {pid: t for pid, t in self._woken.items() if pid in last}
+            parked = list(self._parked)
+        self.version += 1
+
+        # Restored from the taskbar or Alt-Tab rather than through Launch - the runner cleared
+        # background_since when its window came back
+        for record in apps.values():
+            if record["pid"] in parked and not record.get("background_since"):
+                self.wake(record)
+
+        # Only single-app processes can be parked or closed without hurting other apps
+        background = sorted(
+            ((record["background_since"], app_id, record) for app_id, record in apps.items()
+             if record.get("background_since") and apps_per_pid[record["pid"]] == 1
+             and record["background_since"] > self._woken.get(record["pid"], 0)),
+            key=lambda item: item[:2])
+
+        if self.policy == "throttle":
+            for since, app_id, record in background:
+                if wall - since >= self.background_after and record["pid"] not in self._parked:
+                    self._park(record, app_id)
+
+        available = _available_memory() if self.memory_low else None
+        if available is not None and available < self.memory_low:
+            for since, app_id, record in background:  # longest in the background first
+                self._close(record, app_id)
+                available += usage.get(app_id, (0, 0))[1]
+                if available >= self.memory_low:
+                    break
+
+    # The pid may have been reused since the record was read, so every signal below is sent
+    # only after checking it's still the recorded process
+
+    def _park(self, record, app_id):
+        pid = record["pid"]
+        with self._lock:
+            if self._stopped or not running.same_process(record):
+                return
+            try:
+                _set_throttled(pid, True)
+            except Exception as e:
+                print(f"Warning: could not throttle {app_id}: {e}")
+                return
+            self._parked[pid] = record
+
+    def _close(self, record, app_id):
+        pid = record["pid"]
+        with self._lock:
+            self._parked.pop(pid, None)
+        if not running.same_process(record):
+            return
+        print(f"Memory is low - closing background app {app_id}")
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError as e:
+            print(f"Warning: could not close {app_id}: {e}")
+            return
+        running.index.clear(app_id, pid)
+
+monitor = ResourceMonitor()
@@ -0,0 +1,14 @@
+"""
+net.py — the single pooled, keep-alive HTTP session shared by the whole client.
+Going through one Session means repeat requests to the store reuse connections
+instead of paying a TCP + TLS handshake each time.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from config import HTTP_POOL_SIZE
+
+session = requests.Session()
+session.headers["User-Agent"] = "OpenMetro"
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
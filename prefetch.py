@@ -0,0 +1,97 @@
+"""
+prefetch.py — fetches per-app metadata ahead of need.
+The UI says which app ids are on screen or about to be; up to `workers` fetches at a time
+run as tasks on the engine loop, in order, and anything that scrolls out of the wanted set
+before its turn comes is dropped. Results are kept for `ttl` seconds so an Install click can
+use them right away; failures are remembered for as long, so scrolling doesn't retry a
+missing metadata.json.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from config import META_PREFETCH_WORKERS
+
+class MetaPrefetcher:
+    def __init__(self, fetch, workers=META_PREFETCH_WORKERS, ttl=60):
+        self.fetch = fetch  # app_id -> metadata dict, may raise; runs on the engine's executor
+        self.workers = workers
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._queue = OrderedDict()  # app ids still wanted, in priority order
+        self._inflight = {}          # app_id -> concurrent.futures.Future of its fetch task
+        self._results = {}           # app_id -> (fetched at, metadata or None if it failed)
+
+    def want(self, app_ids):
+        """Replaces the wanted set. Queued ids not in app_ids are cancelled."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._results) > 1024:  # want() runs on every scroll, so prune only now and then
+                self._results = {k: v for k, v in self._results.items() if now - v[0] < self.ttl}
+            self._queue = OrderedDict((app_id, None) for app_id in app_ids
+                                      if app_id not in self._inflight and not self._fresh(app_id, now)[0])
+            self._pump()
+
+    def get(self, app_id):
+        """Returns prefetched metadata if it's still fresh, else None. Never blocks."""
+        with self._lock:
+            return self._fresh(app_id, time.monotonic())[1]
+
+    def resolve(self, app_id, timeout=10):
+        """Blocking shim over resolve_async() for callers off the engine loop. None if the
+        metadata can't be fetched within timeout."""
+        meta, future = self._lookup(app_id)
+        if future is None:
+            return meta
+        try:
+            return future.result(timeout)
+        except Exception:
+            return None  # timed out - the fetch carries on and lands in the cache
+
+    async def resolve_async(self, app_id):
+        """Returns metadata for app_id, awaiting an in-flight prefetch or starting a fetch if
+        there's none. None if it can't be fetched."""
+        meta, future = self._lookup(app_id)
+        return meta if future is None else await asyncio.wrap_future(future)
+
+    def _lookup(self, app_id):
+        """Returns (metadata, None) for a fresh result, else (None, future of its fetch)."""
+        with self._lock:
+            found, meta = self._fresh(app_id, time.monotonic())
+            self._queue.pop(app_id, None)
+            if found:
+                return meta, None
+            future = self._inflight.get(app_id)
+            return None, future if future is not None else self._start(app_id)
+
+    def _fresh(self, app_id, now):
+        """Returns (found, metadata); caller holds the lock."""
+        hit = self._results.get(app_id)
+        if hit is None or now - hit[0] >= self.ttl:
+            return False, None
+        return True, hit[1]
+
+    def _pump(self):
+        """Starts queued fetches while there's room; caller holds the lock."""
+        while self._queue and len(self._inflight) < self.workers:
+            app_id, _ = self._queue.popitem(last=False)
+            if app_id not in self._inflight:
+                self._start(app_id)
+
+    def _start(self, app_id):
+        import engine  # engine imports store, which builds its MetaPrefetcher at import time
+        # Caller holds the lock, so _load can't finish and pop the entry before it's added
+        future = self._inflight[app_id] = engine.submit(self._load(app_id))
+        return future
+
+    async def _load(self, app_id):
+        meta = None
+        try:
+            meta = await asyncio.to_thread(self.fetch, app_id)
+        except Exception as e:
+            print(f"Warning: could not fetch metadata for {app_id}: {e}")
+        with self._lock:
+            self._results[app_id] = (time.monotonic(), meta)
+            self._inflight.pop(app_id, None)
+            self._pump()
+        return meta
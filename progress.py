@@ -0,0 +1,93 @@
+"""
+progress.py — coalesces per-chunk download progress into a snapshot the UI polls.
+Download threads only store numbers here; the UI drains whatever changed once per
+frame, so a big download costs a handful of redraws instead of one Tk callback per chunk.
+"""
+import threading
+import time
+from config import PROGRESS_STEP
+
+class Progress:
+    __slots__ = ("downloaded", "total", "rate", "done", "_sample_time", "_sample_bytes", "_shown")
+
+    def __init__(self):
+        self.downloaded = 0
+        self.total = 0
+        self.rate = 0.0  # bytes/sec, smoothed
+        self.done = False
+        self._sample_time = time.monotonic()
+        self._sample_bytes = 0
+        self._shown = None
+
+    @property
+    def percent(self):
+        return self.downloaded / self.total * 100 if self.total else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the current rate, or None if unknown."""
+        if not self.total or not self.rate:
+            return None
+        return max(0.0, (self.total - self.downloaded) / self.rate)
+
+class ProgressTracker:
+    def __init__(self, step=PROGRESS_STEP):
+        self.step = step
+        self._lock = threading.Lock()
+        self._items = {}
+        self._dirty = set()
+
+    def update(self, key, downloaded, total):
+        """Records progress for key. Safe to call from any thread on every chunk."""
+        now = time.monotonic()
+        with self._lock:
+            p = self._items.get(key)
+            if p is None or p.done:
+                p = self._items[key] = Progress()
+                p._sample_bytes = downloaded
+            p.downloaded, p.total = downloaded, total
+            elapsed = now - p._sample_time
+            if elapsed >= 0.25:
+                instant = (downloaded - p._sample_bytes) / elapsed
+                p.rate = instant if not p.rate else 0.7 * p.rate + 0.3 * instant
+                p._sample_time, p._sample_bytes = now, downloaded
+            if p._shown is None or abs(p.percent - p._shown) >= self.step:
+                self._dirty.add(key)
+
+    def finish(self, key):
+        with self._lock:
+            p = self._items.get(key)
+            if p:
+                p.done = True
+                self._dirty.add(key)
+
+    def get(self, key):
+        with self._lock:
+            return self._items.get(key)
+
+    def drain(self):
+        """Returns {key: Progress} for everything worth redrawing since the last drain."""
+        with self._lock:
+            changed = {}
+            for key in self._dirty:
+                p = self._items[key]
+                p._shown = p.percent
+                changed[key] = p
+                if p.done:
+                    del self._items[key]
+            self._dirty.clear()
+            return changed
+
+    def active(self):
+        with self._lock:
+            return bool(self._items)
+
+def format_rate(p):
+    """Short human-readable throughput/ETA string, e.g. '2.4 MB/s · 12s left'."""
+    if not p.rate:
+        return ""
+    text = f"{p.rate / 1_000_000:.1f} MB/s"
+    eta = p.eta
+    if eta is not None:
+        text += f"  •  {int(eta // 60)}m {int(eta % 60)}s left" if eta >= 60 else f"  •  {int(eta)}s left"
+    return text
@@ -0,0 +1,124 @@
+"""
+records.py — compact typed app records for the registry and installed manifests.
+An AppRecord keeps the well-known fields in __slots__ with repeated strings (authors,
+versions, tags) interned, and anything else in a small `extra` dict. It still reads like
+the JSON dict it came from (record["name"], record.get("author", "")) so existing callers
+keep working; to_dict() gives the plain dict back for writing JSON.
+"""
+import sys
+from collections.abc import Mapping
+
+_intern = sys.intern
+
+class AppRecord(Mapping):
+    FIELDS = ("id", "name", "version", "author", "description", "tags", "entry", "download", "checksum")
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, id, name, version, author=None, description=None, tags=None,
+                 entry=None, download=None, checksum=None, extra=None):
+        self.id = _intern(id)
+        self.name = name
+        self.version = _intern(version) if isinstance(version, str) else version
+        self.author = _intern(author) if isinstance(author, str) else author
+        self.description = description
+        self.tags = tuple(_intern(t) for t in tags) if isinstance(tags, (list, tuple)) else tags
+        self.entry = _intern(entry) if isinstance(entry, str) else entry
+        self.download = download
+        self.checksum = checksum
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, d):
+        """Raises ValueError for entries without a string id, a name and a version."""
+        if isinstance(d, AppRecord):
+            return d
+        if not isinstance(d, Mapping) or not isinstance(d.get("id"), str) or \
+                d.get("name") is None or d.get("version") is None:
+            raise ValueError(f"malformed app entry {str(d)[:80]}")
+        known = {k: v for k, v in d.items() if k in _KNOWN}
+        extra = {_intern(k): v for k, v in d.items() if k not in _KNOWN}
+        return cls(extra=extra, **known)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    # Mapping view - absent optional fields are stored as None and hidden here
+    def __getitem__(self, key):
+        if key in _KNOWN:
+            value = getattr(self, key)
+            if value is not None:
+                return list(value) if key == "tags" else value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        # Hot in search indexing and card binding, so skip Mapping's try/except round trip
+        if key in _KNOWN:
+            value = getattr(self, key)
+            return default if value is None else list(value) if key == "tags" else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def __contains__(self, key):
+        if key in _KNOWN:
+            return getattr(self, key) is not None
+        return bool(self.extra) and key in self.extra
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if isinstance(other, AppRecord):
+            return self._values() == other._values()
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def _values(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __reduce__(self):
+        # Positional tuples pickle far smaller and faster than the default slot-state dict
+        return AppRecord, self._values()
+
+    def __repr__(self):
+        return f"AppRecord({self.id!r}, {self.version!r})"
+
+_KNOWN = frozenset(AppRecord.FIELDS)
+
+class Catalog(list):
+    """A list of AppRecords with an app-id index. Treated as immutable once built."""
+    def __init__(self, records=()):
+        super().__init__(records)
+        self.by_id = {record.id: record for record in self}
+
+    @classmethod
+    def from_dicts(cls, apps):
+        """Builds a Catalog from registry entries, skipping malformed ones so a single bad
+        entry can't take the whole store down."""
+        if isinstance(apps, Catalog):
+            return apps
+        records, skipped = [], 0
+        for app in apps:
+            try:
+                records.append(AppRecord.from_dict(app))
+            except (TypeError, ValueError) as e:
+                skipped += 1
+                if skipped == 1:
+                    print(f"Warning: skipping {e}")
+        if skipped > 1:
+            print(f"Warning: skipped {skipped} malformed app entries in total")
+        return cls(records)
+
+    def get(self, app_id, default=None):
+        return self.by_id.get(app_id, default)
+
+    def to_dicts(self):
+        return [record.to_dict() for record in self]
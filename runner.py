@@ -1,8 +1,18 @@
 """
 runner.py — launched as a subprocess to open an app fullscreen.
 Usage: python runner.py <path_to_index.html> <app_name>
+       python runner.py --host <path_to_index.html> <app_name>   (shared host, see host())
+       python runner.py --warm   (pre-started by launcher.RunnerPool: imports pywebview, then
+                                  waits for one {"entry", "name", "launched_at"} line on stdin)
 """
+import json
+import os
 import sys
+import time
+from pathlib import Path
+import assets
+import running
+from config import APPS_DIR
 
 TITLEBAR_JS = """
 (function() {
@@ -121,13 +131,36 @@ TITLEBAR_JS = """
 """
 
 def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "--warm":
+        return warm()
+    if len(sys.argv) >= 4 and sys.argv[1] == "--host":
+        return host(sys.argv[2], sys.argv[3], _launched_at())
     if len(sys.argv) < 3:
         print("Usage: runner.py <entry_html> <app_name>")
         sys.exit(1)
+    open_app(sys.argv[1], sys.argv[2], _launched_at())
 
-    entry = sys.argv[1]
-    name = sys.argv[2]
+def _launched_at():
+    value = os.environ.get("OPENMETRO_LAUNCHED_AT")
+    return float(value) if value else None
 
+def warm():
+    """Does the slow part of start-up ahead of time, then waits for the launcher to hand over an app."""
+    try:
+        # webview.guilib is only set once start() runs; the module-level function loads the
+        # GUI backend now rather than after the click
+        from webview.guilib import initialize
+        initialize()
+    except Exception as e:
+        print(f"Warning: could not preload the GUI backend, the first window will open slower: {e}")
+    assets.ensure_server()
+    line = sys.stdin.readline()
+    if not line:
+        return  # client went away without using us
+    request = json.loads(line)
+    open_app(request["entry"], request["name"], request.get("launched_at"))
+
+def open_app(entry, name, launched_at=None):
     try:
         import webview
     except ImportError:
@@ -136,6 +169,88 @@ def main():
         print("pywebview not installed - opened in browser instead.")
         return
 
+    _create_window(webview, entry, name, launched_at)
+    webview.start(debug=False, private_mode=False, http_server=True)
+
+def host(entry, name, launched_at=None):
+    """Shared host mode: this process owns a window per app, opening more as the launcher
+    sends {"entry", "name", "launched_at"} requests, and exits when its last window closes."""
+    import secrets
+    import threading
+    from multiprocessing.connection import Listener
+    from config import RUNNER_HOST_KEY_FILE, get_runner_host_address
+
+    try:
+        import webview
+    except ImportError:
+        return open_app(entry, name, launched_at)
+
+    address = get_runner_host_address()
+    if not address.startswith("\\\\"):
+        try:
+            os.unlink(address)  # stale socket from a host that didn't get to clean up
+        except OSError:
+            pass
+    key = secrets.token_bytes(32)
+    listener = Listener(address, authkey=key)
+    RUNNER_HOST_KEY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = RUNNER_HOST_KEY_FILE.with_suffix(".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(tmp, RUNNER_HOST_KEY_FILE)
+
+    lock = threading.Lock()
+    state = {"open": 0, "closing": False}
+
+    def on_closed():
+        with lock:
+            state["open"] -= 1
+            state["closing"] = state["open"] == 0  # refuse new windows once the GUI loop is ending
+
+    def open_window(entry, name, launched_at):
+        with lock:
+            if state["closing"]:
+                return False
+            state["open"] += 1
+        _create_window(webview, entry, name, launched_at, on_closed)
+        return True
+
+    def serve():
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return  # listener closed on exit
+            except Exception:
+                continue  # failed authentication
+            with conn:
+                try:
+                    request = conn.recv()
+                    if open_window(request["entry"], request["name"], request.get("launched_at")):
+                        conn.send("ok")
+                except Exception as e:
+                    print(f"Warning: runner host could not open a window: {e}")
+
+    open_window(entry, name, launched_at)
+    threading.Thread(target=serve, daemon=True).start()
+    try:
+        webview.start(debug=False, private_mode=False, http_server=True)
+    finally:
+        listener.close()
+        try:
+            if RUNNER_HOST_KEY_FILE.read_bytes() == key:  # a newer host may have taken over
+                RUNNER_HOST_KEY_FILE.unlink()
+        except OSError:
+            pass
+
+def _app_id(entry):
+    try:
+        return Path(entry).resolve().relative_to(APPS_DIR.resolve()).parts[0]
+    except (ValueError, IndexError):
+        return None  # not an installed app
+
+def _create_window(webview, entry, name, launched_at=None, on_closed=None):
     class Api:
         def close(self):
             window.destroy()
@@ -156,11 +271,22 @@ def main():
             if client_hwnd:
                 ctypes.windll.user32.ShowWindow(client_hwnd, 9)   # SW_RESTORE
                 ctypes.windll.user32.SetForegroundWindow(client_hwnd)
+            set_background(True)
+
+    app_id = _app_id(entry)
+    url = f"file:///{entry}"
+    if app_id:
+        try:
+            if not assets.ensure_server():
+                raise OSError("not reachable")
+            url = assets.app_url(app_id, entry)
+        except Exception as e:
+            print(f"Warning: asset server unavailable, loading {name} from disk: {e}")
 
     api = Api()
     window = webview.create_window(
         name,
-        url=f"file:///{entry}",
+        url=url,
         fullscreen=True,
         frameless=True,
         easy_drag=False,
@@ -169,9 +295,28 @@ def main():
 
     def on_loaded():
         window.evaluate_js(TITLEBAR_JS)
+        if launched_at:
+            print(f"{name}: first paint {(time.time() - launched_at) * 1000:.0f} ms after launch")
+
+    def on_window_closed():
+        if app_id:
+            running.index.clear(app_id, os.getpid())
+        if on_closed:
+            on_closed()
 
+    def set_background(background):
+        # The client's resource monitor reads this to throttle or close idle apps, and to un-throttle them once restored
+        if app_id:
+            running.index.mark(app_id, os.getpid(), name,
+                               background_since=time.time() if background else None)
+
+    set_background(False)
     window.events.loaded += on_loaded
-    webview.start(debug=False, private_mode=False, http_server=True)
+    window.events.closed += on_window_closed
+    for event, background in (("minimized", True), ("restored", False), ("shown", False)):
+        if hasattr(window.events, event):  # not every pywebview version has these
+            getattr(window.events, event).__iadd__(lambda background=background: set_background(background))
+    return window
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+"""
+running.py — which apps are currently running, so a second Launch focuses the app instead
+of starting another runner. Each running app has RUN_DIR/<app_id>.json ({"pid", "started",
+"name", "background_since"}), written by the launcher when it starts a runner and by the runner when
+it opens or minimizes the window, and removed when the window closes. Files left behind by
+a runner that died are dropped whenever they're read. "started" is the process's creation
+time, so a record is never taken for whatever process reuses the pid later.
+"""
+import json
+import os
+import sys
+import threading
+from config import RUN_DIR
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def pid_alive(pid):
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ok = kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return bool(ok) and code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def process_started(pid):
+    """Creation time of pid in an OS-specific unit, or None if there's no such process.
+    Only meant to be compared with another value from this function."""
+    try:
+        if psutil:
+            return psutil.Process(pid).create_time()
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+            if not handle:
+                return None
+            try:
+                created, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+                if not kernel32.GetProcessTimes(handle, ctypes.byref(created), ctypes.byref(exited),
+                                                ctypes.byref(kernel), ctypes.byref(user)):
+                    return None
+            finally:
+                kernel32.CloseHandle(handle)
+            return created.dwHighDateTime << 32 | created.dwLowDateTime
+        with open(f"/proc/{pid}/stat") as f:
+            return int(f.read().rsplit(")", 1)[1].split()[19])  # starttime, in clock ticks since boot
+    except Exception:
+        return None
+
+def same_process(record):
+    """True if the process recorded in record is still alive and is the one that was recorded,
+    not a newer one that got the same pid."""
+    if not pid_alive(record["pid"]):
+        return False
+    started = record.get("started")
+    return started is None or process_started(record["pid"]) == started
+
+def focus(record):
+    """Brings a running app's window to the front. False if it couldn't be found."""
+    if sys.platform != "win32":
+        return False
+    import ctypes
+    hwnd = ctypes.windll.user32.FindWindowW(None, record["name"])
+    if not hwnd:
+        return False
+    ctypes.windll.user32.ShowWindow(hwnd, 9)  # SW_RESTORE
+    ctypes.windll.user32.SetForegroundWindow(hwnd)
+    return True
+
+class RunningApps:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._apps = {}  # app_id -> record as of the last refresh()
+        self._mtime = None
+
+    def _path(self, app_id):
+        return RUN_DIR / f"{app_id}.json"
+
+    def mark(self, app_id, pid, name, background_since=None):
+        """Records app_id as running in pid; background_since is when its window was last
+        minimized, None while it's in front."""
+        record = {"pid": pid, "started": process_started(pid), "name": name,
+                  "background_since": background_since}
+        RUN_DIR.mkdir(parents=True, exist_ok=True)
+        path = self._path(app_id)
+        tmp = path.with_name(f"{path.name}.{pid}.tmp")
+        tmp.write_text(json.dumps(record))
+        os.replace(tmp, path)
+        with self._lock:
+            self._apps[app_id] = record
+
+    def clear(self, app_id, pid=None):
+        """Forgets app_id, but only if it's still recorded under pid (when given) - a newer
+        runner may have taken it over."""
+        path = self._path(app_id)
+        try:
+            if pid is None or json.loads(path.read_text())["pid"] == pid:
+                path.unlink()
+        except (OSError, ValueError, KeyError):
+            pass
+        with self._lock:
+            if pid is None or self._apps.get(app_id, {}).get("pid") == pid:
+                self._apps.pop(app_id, None)
+
+    def clear_pid(self, pid):
+        """Forgets every app recorded under pid, e.g. once that runner process has exited."""
+        for app_id, record in list(self.refresh_all().items()):
+            if record["pid"] == pid:
+                self.clear(app_id, pid)
+
+    def get(self, app_id):
+        """Returns the live record for app_id, or None. Reads the disk, so it sees runners
+        started from the Start menu too."""
+        try:
+            record = json.loads(self._path(app_id).read_text())
+        except (OSError, ValueError):
+            return None
+        if not same_process(record):  # exited, possibly with its pid already reused
+            self.clear(app_id, record["pid"])
+            return None
+        return record
+
+    def refresh(self):
+        """Re-reads RUN_DIR if it changed since the last call. Returns True if it did."""
+        try:
+            mtime = RUN_DIR.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self.refresh_all()
+        self._mtime = mtime
+        return True
+
+    def refresh_all(self):
+        apps = {}
+        if RUN_DIR.exists():
+            for path in RUN_DIR.glob("*.json"):
+                record = self.get(path.stem)
+                if record is not None:
+                    apps[path.stem] = record
+        with self._lock:
+            self._apps = apps
+        return apps
+
+    def is_running(self, app_id):
+        """In-memory answer as of the last refresh()/mark()/clear(); never touches the disk."""
+        return app_id in self._apps
+
+index = RunningApps()
@@ -0,0 +1,168 @@
+"""
+search_index.py — ranked in-memory search over the store registry.
+Built once per registry load: an inverted index of name/tag/author/description tokens
+with compact array postings, a sorted vocabulary for prefix matching and a trigram map
+for typo-tolerant lookups.
+"""
+import bisect
+import heapq
+import re
+from array import array
+from collections import OrderedDict, defaultdict
+
+# Field weights: a hit in the name counts for far more than one in the description
+FIELDS = (("name", 10), ("tags", 6), ("author", 4), ("description", 1))
+MAX_EXPANSIONS = 64  # vocabulary tokens a prefix/typo term may expand to
+RESULT_CACHE_SIZE = 64
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+def _field_text(app, field):
+    value = app.get(field) or ""
+    return " ".join(value) if isinstance(value, (list, tuple)) else str(value)
+
+def _trigrams(token):
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps cost 1), or limit + 1 once exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+class SearchIndex:
+    def __init__(self, apps):
+        self.apps = apps
+        building = defaultdict(dict)  # token -> {doc: weight}
+        for doc, app in enumerate(apps):
+            for field, weight in FIELDS:
+                for token in tokenize(_field_text(app, field)):
+                    postings = building[token]
+                    if weight > postings.get(doc, 0):
+                        postings[doc] = weight
+        # Parallel arrays keep 100k-entry catalogs to a few bytes per posting: docs ascending
+        # (for bisect lookups) plus the same docs best-weight-first (for top-k without scoring all)
+        self._postings = {}
+        for token, postings in building.items():
+            ranked = sorted(postings, key=lambda doc: (-postings[doc], doc))
+            self._postings[token] = (array("I", postings.keys()), array("B", postings.values()), array("I", ranked))
+        self._vocab = sorted(self._postings)
+        self._grams = defaultdict(list)
+        for token in self._vocab:
+            for gram in _trigrams(token):
+                self._grams[gram].append(token)
+        self._results = OrderedDict()
+
+    def _weight(self, token, doc):
+        docs, weights, _ = self._postings[token]
+        i = bisect.bisect_left(docs, doc)
+        return weights[i] if i < len(docs) and docs[i] == doc else 0
+
+    def _expand(self, term):
+        """Returns [(token, factor)] for vocabulary tokens matching term exactly, by prefix or with typos."""
+        matches = []
+        if term in self._postings:
+            matches.append((term, EXACT))
+        lo = bisect.bisect_right(self._vocab, term)
+        hi = bisect.bisect_left(self._vocab, term + "\uffff", lo)
+        # Shorter completions first: "calc" should prefer "calc" + 4 over "calc" + 12
+        for token in sorted(self._vocab[lo:hi], key=len)[:MAX_EXPANSIONS]:
+            matches.append((token, PREFIX * (0.5 + 0.5 * len(term) / len(token))))
+        if matches or len(term) < 3:
+            return matches
+
+        limit = 1 if len(term) <= 5 else 2
+        grams = _trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for token in self._grams.get(gram, ()):
+                shared[token] += 1
+        # Each edit can break at most three trigrams, so anything sharing fewer can't be close enough
+        need = max(1, len(grams) - 3 * limit)
+        candidates = [t for t, n in shared.items() if n >= need and abs(len(t) - len(term)) <= limit]
+        candidates = heapq.nlargest(MAX_EXPANSIONS * 4, candidates, key=shared.get)
+        for token in candidates:
+            distance = _edit_distance(term, token, limit)
+            if distance <= limit:
+                matches.append((token, FUZZY / distance))
+        return matches[:MAX_EXPANSIONS]
+
+    def search(self, query, limit=None):
+        """Returns apps matching every query term, best first. limit=None returns all matches."""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return list(self.apps[:limit] if limit else self.apps)
+        key = (tuple(terms), limit)
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        expansions = [self._expand(term) for term in terms]
+        if not all(expansions):
+            ranked = []
+        elif len(terms) == 1 and limit:
+            ranked = self._top_single(expansions[0], limit)
+        else:
+            ranked = self._rank_all(expansions, limit)
+
+        result = [self.apps[doc] for doc in ranked]
+        self._results[key] = result
+        if len(self._results) > RESULT_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return result
+
+    def _top_single(self, expansion, limit):
+        # A doc outside the `limit` best postings of every token it matches is beaten by at
+        # least `limit` other docs, so only those heads need scoring.
+        best = {}
+        for token, factor in expansion:
+            _, _, ranked = self._postings[token]
+            for doc in ranked[:limit]:
+                score = self._weight(token, doc) * factor
+                if score > best.get(doc, 0):
+                    best[doc] = score
+        top = heapq.nlargest(limit, best.items(), key=lambda item: (item[1], -item[0]))
+        return [doc for doc, _ in top]
+
+    def _rank_all(self, expansions, limit):
+        # Candidates must match every term; the set intersection runs in C
+        doc_sets = sorted((set().union(*(self._postings[t][0] for t, _ in exp)) for exp in expansions), key=len)
+        candidates = doc_sets[0].intersection(*doc_sets[1:])
+        if not candidates:
+            return []
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for expansion in expansions:
+            term_scores = {}
+            # Walk the postings or bisect per candidate, whichever touches fewer entries
+            if sum(len(self._postings[t][0]) for t, _ in expansion) < len(candidates) * len(expansion) * 4:
+                for token, factor in expansion:
+                    docs, weights, _ = self._postings[token]
+                    for doc, weight in zip(docs, weights):
+                        if doc in candidates and weight * factor > term_scores.get(doc, 0):
+                            term_scores[doc] = weight * factor
+            else:
+                for doc in candidates:
+                    term_scores[doc] = max(self._weight(token, doc) * factor for token, factor in expansion)
+            for doc in candidates:
+                scores[doc] += term_scores[doc]
+
+        key = lambda item: (item[1], -item[0])  # ties keep registry order
+        top = heapq.nlargest(limit, scores.items(), key=key) if limit else sorted(scores.items(), key=key, reverse=True)
+        return [doc for doc, _ in top]
@@ -0,0 +1,51 @@
+"""
+snapshot.py — binary snapshot of the registry and its search index for instant cold starts.
+Layout: a fixed header, then a tiny pickled first page of apps, then the pickled
+(apps, SearchIndex) pair. The first page can be read through mmap without touching the
+rest, so the Store tab has something to show before the full registry is even loaded.
+The snapshot lives in CACHE_DIR, which only this user writes, so pickle is acceptable here.
+"""
+import mmap
+import os
+import pickle
+import struct
+import threading
+from config import CACHE_DIR
+
+SNAPSHOT_FILE = CACHE_DIR / "registry.snapshot"
+FORMAT = 2  # bump when the layout or SearchIndex internals change; old snapshots are ignored
+FIRST_PAGE = 30
+
+_MAGIC = b"OMRS"
+_HEADER = struct.Struct("<4sHQQ")  # magic, format, first page length, body length
+
+def save(apps, index):
+    head = pickle.dumps(apps[:FIRST_PAGE], protocol=pickle.HIGHEST_PROTOCOL)
+    body = pickle.dumps((apps, index), protocol=pickle.HIGHEST_PROTOCOL)
+    SNAPSHOT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = SNAPSHOT_FILE.with_name(f"{SNAPSHOT_FILE.name}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, FORMAT, len(head), len(body)))
+        f.write(head)
+        f.write(body)
+    os.replace(tmp, SNAPSHOT_FILE)
+
+def _read(part):
+    try:
+        with open(SNAPSHOT_FILE, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            magic, fmt, head_len, body_len = _HEADER.unpack_from(m)
+            if magic != _MAGIC or fmt != FORMAT or len(m) != _HEADER.size + head_len + body_len:
+                return None
+            start = _HEADER.size if part == "head" else _HEADER.size + head_len
+            length = head_len if part == "head" else body_len
+            return pickle.loads(m[start:start + length])
+    except Exception:
+        return None  # missing, truncated or from an incompatible build - just rebuild it
+
+def load_first_page():
+    """Returns the first page of apps from the snapshot, or None. Cheap enough for the Tk thread."""
+    return _read("head")
+
+def load():
+    """Returns (apps, SearchIndex) from the snapshot, or None."""
+    return _read("body")
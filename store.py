@@ -1,42 +1,291 @@
-import requests
 import json
-from config import STORE_URL, CACHE_DIR
+import threading
+import time
+import cache
+from search_index import SearchIndex
+from records import AppRecord, Catalog
+from prefetch import MetaPrefetcher
+from net import session
+from config import STORE_URL, CACHE_DIR, REGISTRY_MAX_AGE, REGISTRY_MAX_GAP
 from pathlib import Path
 
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-def _cached_get(url, cache_file, max_age=300):
-    """Fetch URL, using cache if fresh enough."""
-    path = CACHE_DIR / cache_file
-    import time
-    if path.exists() and (time.time() - path.stat().st_mtime) < max_age:
-        return json.loads(path.read_text())
+_lock = threading.Lock()
+_inflight = {}  # key -> _Flight, so concurrent callers share one request
+_stats = dict.fromkeys(("hits", "misses", "stale", "revalidated", "refreshed", "synced", "coalesced", "errors"), 0)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def _count(key):
+    with _lock:
+        _stats[key] += 1
+
+def cache_stats():
+    """Hit/miss/revalidation counters for diagnostics."""
+    with _lock:
+        return dict(_stats)
+
+def _validators_path(path):
+    return path.with_name(path.name + ".meta")
+
+def _revalidate(url, path):
+    """Conditional GET against the cached copy. Returns (data, changed)."""
+    headers = {}
+    if path.exists():
+        try:
+            validators = json.loads(_validators_path(path).read_text())
+        except Exception:
+            validators = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    r = session.get(url, headers=headers, timeout=10)
+    if r.status_code == 304 and path.exists():
+        _count("revalidated")
+        path.touch()  # unchanged - just restart the max_age clock
+        return cache.read_json(path), False
+    r.raise_for_status()
+    data = r.json()
+    _count("refreshed")
+    cache.write_json(path, data)
+    cache.atomic_write(_validators_path(path), json.dumps({
+        "etag": r.headers.get("etag"),
+        "last_modified": r.headers.get("last-modified"),
+    }).encode())
+    return data, True
+
+def _single_flight(key, fn, *args):
+    """Runs fn(*args) once however many threads ask for the same key at the same time."""
+    with _lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+        else:
+            _stats["coalesced"] += 1
+    if not leader:
+        flight.done.wait()
+        if flight.error:
+            raise flight.error
+        return flight.result
+
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        path.write_text(json.dumps(data))
-        return data
+        flight.result = fn(*args)
+        return flight.result
     except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            del _inflight[key]
+        flight.done.set()
+
+def _fetch(url, path):
+    return _single_flight(url, _revalidate, url, path)
+
+def _refresh_in_background(url, path, on_refresh):
+    with _lock:
+        if url in _inflight:
+            return  # someone is already fetching it
+
+    def run():
+        try:
+            data, changed = _fetch(url, path)
+        except Exception as e:
+            _count("errors")
+            print(f"Warning: background refresh of {url} failed: {e}")
+            return
+        if changed and on_refresh:
+            on_refresh(data)
+
+    threading.Thread(target=run, daemon=True).start()
+
+def _cached_get(url, cache_file, max_age=300, stale_while_revalidate=False, on_refresh=None):
+    """Fetch URL, using cache if fresh enough and revalidating it with ETag/Last-Modified.
+
+    With stale_while_revalidate an expired copy is returned immediately and refreshed in
+    the background; on_refresh(data) is called (from that thread) if the content changed."""
+    path = cache.path_for(cache_file)
+    if path.exists():
+        try:
+            fresh = (time.time() - path.stat().st_mtime) < max_age
+            if fresh or stale_while_revalidate:
+                data = cache.read_json(path)
+                if fresh:
+                    _count("hits")
+                else:
+                    _count("stale")
+                    _refresh_in_background(url, path, on_refresh)
+                return data
+        except (OSError, ValueError):
+            pass  # unreadable cache entry - fetch it again
+
+    _count("misses")
+    try:
+        return _fetch(url, path)[0]
+    except Exception as e:
+        _count("errors")
         if path.exists():
-            return json.loads(path.read_text())  # serve stale cache on error
+            return cache.read_json(path)  # serve stale cache on error
         raise e
 
-def fetch_registry():
-    """Returns list of all app metadata dicts."""
-    return _cached_get(f"{STORE_URL}/index.json", "index.json")
+# --- Registry sync ---
+# The store publishes registry/head.json ({"version": N, "oldest": M}) and one change log per
+# version, registry/changes/<v>.json ({"put": [app, ...], "delete": [id, ...]}). A client at
+# version v >= M replays v+1..N instead of downloading index.json; further behind than
+# REGISTRY_MAX_GAP, or against a store without head.json, it does a full resync.
+# The local copy is cached as {"version": N or None, "apps": [...]}.
+
+def _get_json(url):
+    r = session.get(url, timeout=10)
+    r.raise_for_status()
+    return r.json()
+
+def _full_registry():
+    return _fetch(f"{STORE_URL}/index.json", cache.path_for("index.json"))[0]
 
-def fetch_featured():
-    return _cached_get(f"{STORE_URL}/featured.json", "featured.json")
+def _sync_registry(local):
+    """Brings the local registry up to date. Returns (apps, version, changed)."""
+    path = cache.path_for("registry.json")
+    try:
+        head = _get_json(f"{STORE_URL}/registry/head.json")
+    except Exception:
+        head = None  # store doesn't do incremental sync - conditional GET of the full index
+    if head is None:
+        apps = _full_registry()
+        changed = local is None or apps != local["apps"]
+        cache.write_json(path, {"version": None, "apps": apps})
+        return apps, None, changed
+
+    version = head["version"]
+    have = local["version"] if local else None
+    if have == version:
+        path.touch()  # up to date - restart the max_age clock
+        return local["apps"], version, False
+
+    if have is not None and head.get("oldest", 0) <= have < version and version - have <= REGISTRY_MAX_GAP:
+        by_id = {app["id"]: app for app in local["apps"]}
+        try:
+            for v in range(have + 1, version + 1):
+                changes = _get_json(f"{STORE_URL}/registry/changes/{v}.json")
+                for app_id in changes.get("delete", []):
+                    by_id.pop(app_id, None)
+                for app in changes.get("put", []):
+                    by_id[app["id"]] = app
+            apps = list(by_id.values())
+            _count("synced")
+        except Exception as e:
+            print(f"Warning: incremental registry sync failed, doing a full resync: {e}")
+            apps = _full_registry()
+    else:
+        apps = _full_registry()
+    # Change logs are idempotent, so a full index newer than `version` just replays a little next time
+    cache.write_json(path, {"version": version, "apps": apps})
+    return apps, version, local is None or apps != local["apps"]
+
+_catalog = [None, None, None]  # (registry version, apps it was built from, Catalog)
+
+def _catalog_for(version, apps):
+    """Returns the Catalog for apps, reusing the last one while the registry is unchanged so
+    the search index built for it is reused too. Unversioned registries are compared by content."""
+    with _lock:
+        last_version, last_apps, catalog = _catalog
+        if catalog is not None and (version == last_version if version is not None else apps == last_apps):
+            return catalog
+    catalog = Catalog.from_dicts(apps)
+    with _lock:
+        _catalog[:] = [version, apps, catalog]
+    return catalog
+
+def fetch_registry(on_refresh=None):
+    """Returns the Catalog of all store apps - the same object for as long as the registry
+    doesn't change. A local copy older than REGISTRY_MAX_AGE is returned straight away and
+    synced in the background, calling on_refresh(registry) if it changed."""
+    path = cache.path_for("registry.json")
+    try:
+        local = cache.read_json(path)
+        age = time.time() - path.stat().st_mtime
+    except (OSError, ValueError):
+        local = None
+    if local is not None:
+        if age < REGISTRY_MAX_AGE:
+            _count("hits")
+        else:
+            _count("stale")
+            _sync_in_background(local, on_refresh)
+        return _catalog_for(local.get("version"), local["apps"])
+
+    _count("misses")
+    try:
+        apps, version, _ = _single_flight("registry", _sync_registry, None)
+        return _catalog_for(version, apps)
+    except Exception:
+        _count("errors")
+        raise
+
+def _sync_in_background(local, on_refresh):
+    with _lock:
+        if "registry" in _inflight:
+            return
+
+    def run():
+        try:
+            apps, version, changed = _single_flight("registry", _sync_registry, local)
+        except Exception as e:
+            _count("errors")
+            print(f"Warning: background registry sync failed: {e}")
+            return
+        if changed and on_refresh:
+            on_refresh(_catalog_for(version, apps))
+
+    threading.Thread(target=run, daemon=True).start()
+
+def fetch_featured(on_refresh=None):
+    return _cached_get(f"{STORE_URL}/featured.json", "featured.json",
+                       stale_while_revalidate=True, on_refresh=on_refresh)
 
 def fetch_app_meta(app_id):
     return _cached_get(f"{STORE_URL}/apps/{app_id}/metadata.json", f"{app_id}.json", max_age=60)
 
-def search_apps(query, registry=None):
+meta_prefetcher = MetaPrefetcher(fetch_app_meta)
+
+def app_details(app):
+    """Returns app overlaid with its metadata.json (download URL, checksum, ...), using a
+    prefetched copy when there is one. Blocking shim over engine.app_details."""
+    return with_meta(app, meta_prefetcher.resolve(app["id"]))
+
+def with_meta(app, meta):
+    """app overlaid with metadata, or app itself if metadata isn't available."""
+    if not meta:
+        return app
+    return AppRecord.from_dict({**app, **meta})
+
+_search_index = [None, None]  # (registry list it was built from, SearchIndex)
+
+def build_search_index(registry):
+    """Returns the SearchIndex for registry, building it if registry is a new list."""
+    with _lock:
+        if _search_index[0] is registry:
+            return _search_index[1]
+    index = SearchIndex(registry)
+    with _lock:
+        _search_index[:] = [registry, index]
+    return index
+
+def set_search_index(registry, index):
+    """Adopts an index built earlier (e.g. loaded from a snapshot) for registry."""
+    with _lock:
+        _search_index[:] = [registry, index]
+
+def search_apps(query, registry=None, limit=None):
+    """Returns registry apps matching query, most relevant first (top `limit` if given)."""
     if registry is None:
         registry = fetch_registry()
-    q = query.lower()
-    return [
-        a for a in registry
-        if q in a["name"].lower() or q in a.get("description", "").lower() or q in a.get("tags", [])
-    ]
+    return build_search_index(registry).search(query, limit)
@@ -2,13 +2,19 @@ import tkinter as tk
 from tkinter import messagebox
 from config import *
 import downloader
+import fsops
 import launcher
+import running
+from monitor import monitor
+from ui.virtual_list import VirtualList
 
 class LibraryTab(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent, bg=BG)
+        self._monitor_version = None
         self._build_ui()
         self.refresh()
+        self._watch_running()
 
     def _build_ui(self):
         header = tk.Frame(self, bg=BG)
@@ -18,66 +24,83 @@ class LibraryTab(tk.Frame):
                   relief="flat", bd=0, padx=8, pady=4, cursor="hand2",
                   command=self.refresh).pack(side="right")
 
-        container = tk.Frame(self, bg=BG)
-        container.pack(fill="both", expand=True, padx=16, pady=8)
-
-        self.canvas = tk.Canvas(container, bg=BG, highlightthickness=0)
-        from tkinter import ttk
-        scrollbar = ttk.Scrollbar(container, orient="vertical", command=self.canvas.yview)
-        self.app_list = tk.Frame(self.canvas, bg=BG)
-        self.app_list.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.app_list, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.app_list = VirtualList(self, CARD_HEIGHT, self._make_app_card, self._bind_app_card,
+                                    key=lambda app: (app.id, app.version))
+        self.app_list.pack(fill="both", expand=True, padx=16, pady=8)
 
         self.empty_label = tk.Label(self, text="No apps installed yet.\nHead to the Store tab to find some!",
                                     bg=BG, fg=FG_DIM, font=(FONT, 11), justify="center")
 
     def refresh(self):
-        for w in self.app_list.winfo_children():
-            w.destroy()
-        self.empty_label.pack_forget()
-
-        apps = downloader.get_installed_apps()
-        if not apps:
+        # Scanning manifests can touch many files; do it off the Tk thread
+        fsops.submit(downloader.get_installed_apps, widget=self, on_done=self._show_apps)
+
+    def _watch_running(self):
+        # One stat of RUN_DIR per tick; cards are only rebound when an app started or stopped
+        # or the resource monitor took a new sample
+        def on_done(changed):
+            if changed or monitor.version != self._monitor_version:
+                self._monitor_version = monitor.version
+                self.app_list.refresh()
+        fsops.submit(running.index.refresh, widget=self, on_done=on_done)
+        self.after(RUNNING_POLL_MS, self._watch_running)
+
+    def _show_apps(self, apps):
+        self.app_list.set_items(apps)
+        if apps:
+            self.empty_label.pack_forget()
+        else:
             self.empty_label.pack(expand=True)
-            return
 
-        for app in apps:
-            self._make_app_card(app)
-
-    def _make_app_card(self, app):
-        card = tk.Frame(self.app_list, bg=BG_CARD, pady=12, padx=14)
-        card.pack(fill="x", pady=4)
+    def _make_app_card(self, parent):
+        card = tk.Frame(parent, bg=BG_CARD, pady=12, padx=14)
+        card.pack_propagate(False)
+        card.app = None
 
         info = tk.Frame(card, bg=BG_CARD)
         info.pack(side="left", fill="both", expand=True)
 
-        tk.Label(info, text=app["name"], bg=BG_CARD, fg=FG, font=(FONT, 12, "bold")).pack(anchor="w")
-        tk.Label(info, text=app.get("description", ""), bg=BG_CARD, fg=FG_DIM, font=(FONT, 9)).pack(anchor="w")
-        tk.Label(info, text=f"v{app['version']}  •  by {app.get('author','unknown')}", bg=BG_CARD, fg=FG_DIM, font=(FONT, 8)).pack(anchor="w", pady=(4,0))
+        card.name_label = tk.Label(info, bg=BG_CARD, fg=FG, font=(FONT, 12, "bold"))
+        card.name_label.pack(anchor="w")
+        card.desc_label = tk.Label(info, bg=BG_CARD, fg=FG_DIM, font=(FONT, 9), anchor="w")
+        card.desc_label.pack(anchor="w", fill="x")
+        card.meta_label = tk.Label(info, bg=BG_CARD, fg=FG_DIM, font=(FONT, 8))
+        card.meta_label.pack(anchor="w", pady=(4,0))
 
         btn_frame = tk.Frame(card, bg=BG_CARD)
         btn_frame.pack(side="right")
 
-        tk.Button(btn_frame, text="Launch", bg=ACCENT, fg=FG, font=(FONT, 9, "bold"),
-                  relief="flat", bd=0, padx=10, pady=6, cursor="hand2",
-                  command=lambda a=app: self._launch(a)).pack(side="left", padx=4)
+        card.launch_btn = tk.Button(btn_frame, text="Launch", bg=ACCENT, fg=FG, font=(FONT, 9, "bold"),
+                                    relief="flat", bd=0, padx=10, pady=6, cursor="hand2",
+                                    command=lambda c=card: self._launch(c.app))
+        card.launch_btn.pack(side="left", padx=4)
 
         tk.Button(btn_frame, text="Uninstall", bg="#AA3333", fg=FG, font=(FONT, 9),
                   relief="flat", bd=0, padx=10, pady=6, cursor="hand2",
-                  command=lambda a=app, c=card: self._uninstall(a, c)).pack(side="left", padx=4)
+                  command=lambda c=card: self._uninstall(c.app)).pack(side="left", padx=4)
+        return card
+
+    def _bind_app_card(self, card, app):
+        card.app = app
+        card.name_label.config(text=app.name)
+        card.desc_label.config(text=app.description or "")
+        is_running = running.index.is_running(app.id)
+        meta = f"v{app.version}  •  by {app.author or 'unknown'}"
+        if is_running:
+            usage = monitor.usage(app.id)
+            meta += f"  •  Running, {usage[0]:.0f}% CPU, {usage[1] >> 20} MB" if usage else "  •  Running"
+        card.meta_label.config(text=meta)
+        card.launch_btn.config(text="Switch to" if is_running else "Launch")
 
     def _launch(self, app):
         try:
-            launcher.launch_app(app["id"])
+            launcher.launch_app(app.id)
         except Exception as e:
             messagebox.showerror("Launch Error", str(e))
+        self.app_list.refresh()
 
-    def _uninstall(self, app, card):
+    def _uninstall(self, app):
         if messagebox.askyesno("Uninstall", f"Uninstall {app['name']}?"):
-            downloader.uninstall_app(app["id"])
-            card.destroy()
-            if not downloader.get_installed_apps():
-                self.empty_label.pack(expand=True)
+            fsops.submit(downloader.uninstall_app, app.id, widget=self,
+                         on_done=lambda _: self.refresh(),
+                         on_error=lambda e: messagebox.showerror("Uninstall Error", str(e)))
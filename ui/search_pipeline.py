@@ -0,0 +1,54 @@
+import threading
+from config import SEARCH_DEBOUNCE_MS
+
+class SearchPipeline:
+    """Debounces queries typed into a Tk widget and runs only the latest one on a worker thread.
+
+    submit() is called from the Tk thread on every keystroke. A query superseded before it
+    starts is never run, and a result that comes back after a newer submit() is dropped, so
+    on_result(results) always sees the latest query only. on_result runs on the Tk thread."""
+
+    def __init__(self, widget, search, on_result, delay_ms=SEARCH_DEBOUNCE_MS):
+        self.widget = widget
+        self.search = search
+        self.on_result = on_result
+        self.delay_ms = delay_ms
+        self._after_id = None
+        self._generation = 0
+        self._pending = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, query, delay_ms=None):
+        if self._after_id:
+            self.widget.after_cancel(self._after_id)
+        self._generation += 1
+        generation = self._generation
+        delay = self.delay_ms if delay_ms is None else delay_ms
+        self._after_id = self.widget.after(delay, lambda: self._dispatch(query, generation))
+
+    def _dispatch(self, query, generation):
+        self._after_id = None
+        with self._cond:
+            self._pending = (query, generation)  # replaces any query the worker hasn't picked up
+            self._cond.notify()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                query, generation = self._pending
+                self._pending = None
+            if generation != self._generation:
+                continue
+            try:
+                results = self.search(query)
+            except Exception as e:
+                print(f"Warning: search failed: {e}")
+                continue
+            self.widget.after(0, lambda g=generation, r=results: self._deliver(g, r))
+
+    def _deliver(self, generation, results):
+        if generation == self._generation:
+            self.on_result(results)
@@ -1,17 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
+import asyncio
 from config import *
 import store as store_api
+import engine
+import snapshot
 import downloader
+from installed import index as installed_index
 import launcher
+from download_manager import manager as download_manager, PRIORITY_HIGH
+from progress import format_rate
+from ui.search_pipeline import SearchPipeline
+from ui.virtual_list import VirtualList
 
 class StoreTab(tk.Frame):
     def __init__(self, parent, on_library_refresh=None):
         super().__init__(parent, bg=BG)
         self.on_library_refresh = on_library_refresh
         self.registry = []
-        self.download_threads = {}
+        self._polling = False
+        self._shown_query = ""  # query the list currently shows results for
+        self._search = SearchPipeline(self, self._search_registry, self._render_apps)
 
         self._build_ui()
         self._load_store()
@@ -36,112 +45,189 @@ class StoreTab(tk.Frame):
         self.status_label = tk.Label(self, text="Loading store...", bg=BG, fg=FG_DIM, font=(FONT, 9))
         self.status_label.pack(anchor="w", padx=16)
 
-        # Scrollable app list
-        container = tk.Frame(self, bg=BG)
-        container.pack(fill="both", expand=True, padx=16, pady=8)
-
-        self.canvas = tk.Canvas(container, bg=BG, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(container, orient="vertical", command=self.canvas.yview)
-        self.app_list = tk.Frame(self.canvas, bg=BG)
-
-        self.app_list.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.app_list, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        self.canvas.bind_all("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1*(e.delta//120), "units"))
+        # Scrollable app list - only the visible cards exist, recycled as you scroll. Keyed on
+        # the version too, so a registry refresh rebinds cards whose app was updated
+        self.app_list = VirtualList(self, CARD_HEIGHT, self._make_app_card, self._bind_app_card,
+                                    key=lambda app: (app.id, app.version), on_layout=self._prefetch_meta)
+        self.app_list.pack(fill="both", expand=True, padx=16, pady=8)
 
     def _load_store(self):
-        def fetch():
+        # Paint the first page from the snapshot straight away; the rest loads in the background
+        first_page = snapshot.load_first_page()
+        if first_page:
+            self.app_list.set_items(first_page)
+
+        def use_registry(registry, snap):
+            """Returns registry once indexed and saved, or None if the snapshot was already current."""
+            if snap is not None and registry == snap[0]:
+                return None
+            index = store_api.build_search_index(registry)  # off the Tk thread
+            snapshot.save(registry, index)
+            return registry
+
+        def show(registry):
+            if registry is not None:
+                self._set_registry(registry)
+
+        def on_refresh(registry):
+            # A stale cached registry was shown first; swap in the fresh one when it lands
+            engine.submit(asyncio.to_thread(use_registry, registry, None), widget=self, on_done=show)
+
+        async def fetch():
+            await asyncio.to_thread(installed_index.revalidate)  # so binding cards never reads manifests
+            snap = await asyncio.to_thread(snapshot.load)
+            if snap is not None:
+                store_api.set_search_index(*snap)
+                self.after(0, lambda: self._set_registry(snap[0]))
+            elif first_page:
+                self.after(0, self.app_list.refresh)  # first page was bound before the index loaded
             try:
-                self.registry = store_api.fetch_registry()
-                self.after(0, lambda: self._render_apps(self.registry))
-                self.after(0, lambda: self.status_label.config(text=f"{len(self.registry)} apps available"))
-            except Exception as e:
-                self.after(0, lambda: self.status_label.config(text=f"Failed to load store: {e}"))
-        threading.Thread(target=fetch, daemon=True).start()
-
-    def _on_search(self, *_):
+                registry = await engine.fetch_registry(on_refresh)
+            except Exception:
+                if snap is None:
+                    raise
+                return None  # keep showing the snapshot
+            return await asyncio.to_thread(use_registry, registry, snap)
+
+        engine.submit(fetch(), widget=self, on_done=show,
+                      on_error=lambda e: self.status_label.config(text=f"Failed to load store: {e}"))
+
+    def _prefetch_meta(self, first, last):
+        # Metadata for what's on screen (and just below it) is fetched ahead of an Install click
+        items = self.app_list.items[first:last + META_PREFETCH_AHEAD]
+        store_api.meta_prefetcher.want([app.id for app in items])
+
+    def _set_registry(self, registry):
+        self.registry = registry
+        self.status_label.config(text=f"{len(self.registry)} apps available")
+        # Versions/installed state may have changed under the same ids
+        self.app_list.refresh()
+        self._on_search(immediate=True)
+
+    def _on_search(self, *_, immediate=False):
         if not hasattr(self, 'app_list'):
             return
-        q = self.search_var.get().strip()
-        if q and q != "Search apps...":
-            results = store_api.search_apps(q, self.registry)
-        else:
-            results = self.registry
-        self._render_apps(results)
+        self._search.submit(self.search_var.get().strip(), delay_ms=0 if immediate else None)
 
-    def _render_apps(self, apps):
-        for w in self.app_list.winfo_children():
-            w.destroy()
+    def _search_registry(self, q):
+        # Runs on the search worker thread
+        registry = self.registry
+        if q and q != "Search apps...":
+            return q, store_api.search_apps(q, registry)
+        return "", registry
 
-        for app in apps:
-            self._make_app_card(app)
+    def _render_apps(self, result):
+        # Visible cards still showing the same app are left alone, and only a new query jumps
+        # back to the top - a registry load re-running the same one keeps the scroll position
+        query, apps = result
+        self.app_list.set_items(apps, reset_scroll=query != self._shown_query)
+        self._shown_query = query
 
-    def _make_app_card(self, app):
-        card = tk.Frame(self.app_list, bg=BG_CARD, pady=12, padx=14, cursor="hand2")
-        card.pack(fill="x", pady=4)
+    def _make_app_card(self, parent):
+        card = tk.Frame(parent, bg=BG_CARD, pady=12, padx=14, cursor="hand2")
+        card.pack_propagate(False)
+        card.app = None
 
         # Left: info
         info = tk.Frame(card, bg=BG_CARD)
         info.pack(side="left", fill="both", expand=True)
 
-        tk.Label(info, text=app["name"], bg=BG_CARD, fg=FG, font=(FONT, 12, "bold")).pack(anchor="w")
-        tk.Label(info, text=app.get("description", ""), bg=BG_CARD, fg=FG_DIM, font=(FONT, 9), wraplength=380, justify="left").pack(anchor="w")
-        tk.Label(info, text=f"v{app['version']}  •  {app.get('author','')}", bg=BG_CARD, fg=FG_DIM, font=(FONT, 8)).pack(anchor="w", pady=(4,0))
+        card.name_label = tk.Label(info, bg=BG_CARD, fg=FG, font=(FONT, 12, "bold"))
+        card.name_label.pack(anchor="w")
+        card.desc_label = tk.Label(info, bg=BG_CARD, fg=FG_DIM, font=(FONT, 9), justify="left", anchor="w")
+        card.desc_label.pack(anchor="w", fill="x")
+        card.meta_label = tk.Label(info, bg=BG_CARD, fg=FG_DIM, font=(FONT, 8))
+        card.meta_label.pack(anchor="w", pady=(4,0))
 
         # Right: button + progress
         right = tk.Frame(card, bg=BG_CARD)
         right.pack(side="right", padx=(8,0))
 
-        installed = downloader.is_installed(app["id"])
-        has_update = downloader.is_update_available(app) if installed else False
-
-        progress_var = tk.DoubleVar()
-        progress_bar = ttk.Progressbar(right, variable=progress_var, maximum=100, length=100)
-        btn_text = "Update" if has_update else ("Launch" if installed else "Install")
-        btn_color = "#FF8C00" if has_update else (ACCENT if not installed else "#333")
-
-        btn = tk.Button(
-            right, text=btn_text, bg=btn_color, fg=FG,
+        card.progress_var = tk.DoubleVar()
+        card.progress_bar = ttk.Progressbar(right, variable=card.progress_var, maximum=100, length=100)
+        card.rate_label = tk.Label(right, text="", bg=BG_CARD, fg=FG_DIM, font=(FONT, 7))
+        card.btn = tk.Button(
+            right, fg=FG,
             font=(FONT, 9, "bold"), relief="flat", bd=0,
-            padx=12, pady=6, cursor="hand2"
+            padx=12, pady=6, cursor="hand2",
+            command=lambda c=card: self._handle_btn(c.app)
         )
-        btn.config(command=lambda a=app, b=btn, pv=progress_var, pb=progress_bar: self._handle_btn(a, b, pv, pb))
-        btn.pack()
+        card.btn.pack()
 
         card.bind("<Enter>", lambda e, c=card: c.config(bg=BG_HOVER))
         card.bind("<Leave>", lambda e, c=card: c.config(bg=BG_CARD))
+        return card
+
+    def _bind_app_card(self, card, app):
+        card.app = app
+        card.name_label.config(text=app.name)
+        card.desc_label.config(text=app.description or "")
+        card.meta_label.config(text=f"v{app.version}  •  {app.author or ''}")
+
+        job = download_manager.get(app.id)
+        if job and job.active:
+            card.btn.config(text="...", bg=ACCENT, state="disabled")
+            card.progress_var.set(job.downloaded / job.total * 100 if job.total else 0)
+            card.progress_bar.pack(pady=(4,0))
+            card.rate_label.pack()
+            return
+        card.progress_bar.pack_forget()
+        card.rate_label.pack_forget()
+
+        installed, has_update = installed_index.status([app], load=False)[app.id]
+        if job and job.state in ("failed", "cancelled") and not (installed and not has_update):
+            card.btn.config(text="Retry", bg=ACCENT, state="normal")
+            return
+        btn_text = "Update" if has_update else ("Launch" if installed else "Install")
+        btn_color = "#FF8C00" if has_update else (ACCENT if not installed else "#333")
+        card.btn.config(text=btn_text, bg=btn_color, state="normal")
+
+    def _card_for(self, app_id):
+        for (bound_id, _), card in self.app_list.bound_rows():
+            if bound_id == app_id:
+                return card
+        return None
 
-    def _handle_btn(self, app, btn, progress_var, progress_bar):
-        if downloader.is_installed(app["id"]) and not downloader.is_update_available(app):
+    def _rebind(self, app_id):
+        card = self._card_for(app_id)
+        if card is not None:
+            self._bind_app_card(card, card.app)
+
+    def _handle_btn(self, app):
+        if downloader.is_installed(app.id) and not downloader.is_update_available(app):
             # Launch
             try:
-                launcher.launch_app(app["id"])
+                launcher.launch_app(app.id)
             except Exception as e:
                 messagebox.showerror("Launch Error", str(e))
             return
 
         # Install or update
-        btn.config(text="...", state="disabled")
-        progress_bar.pack(pady=(4,0))
-
-        def do_download():
-            try:
-                def on_progress(dl, total):
-                    if total:
-                        pct = (dl / total) * 100
-                        self.after(0, lambda: progress_var.set(pct))
-
-                downloader.download_app(app, progress_callback=on_progress)
-                self.after(0, lambda: btn.config(text="Launch", bg="#333", state="normal"))
-                self.after(0, lambda: progress_bar.pack_forget())
-                if self.on_library_refresh:
-                    self.after(0, self.on_library_refresh)
-            except Exception as e:
-                self.after(0, lambda: btn.config(text="Retry", state="normal"))
-                self.after(0, lambda: progress_bar.pack_forget())
-                self.after(0, lambda err=e: messagebox.showerror("Download Error", str(err)))
-
-        threading.Thread(target=do_download, daemon=True).start()
+        def on_done(job):
+            self.after(0, lambda: self._on_download_done(job))
+
+        download_manager.submit(app, priority=PRIORITY_HIGH, on_done=on_done, resolve=engine.app_details)
+        self._rebind(app.id)
+        if not self._polling:
+            self._polling = True
+            self._poll_progress()
+
+    def _on_download_done(self, job):
+        self._rebind(job.app_id)
+        if job.state == "done" and self.on_library_refresh:
+            self.on_library_refresh()
+        if job.error:
+            messagebox.showerror("Download Error", str(job.error))
+
+    def _poll_progress(self):
+        # One redraw per tick for all running downloads, however fast the chunks arrive
+        for app_id, p in download_manager.progress.drain().items():
+            card = self._card_for(app_id)
+            if card is None or p.done:
+                continue  # scrolled away, or finished and about to be rebound
+            card.progress_var.set(p.percent)
+            card.rate_label.config(text=format_rate(p))
+        if download_manager.progress.active() or any(job.active for job in download_manager.jobs()):
+            self.after(PROGRESS_INTERVAL_MS, self._poll_progress)
+        else:
+            self._polling = False
@@ -0,0 +1,103 @@
+import tkinter as tk
+from tkinter import ttk
+from config import BG
+
+class VirtualList(tk.Frame):
+    """Scrollable list of fixed-height rows that only builds enough rows to fill the viewport.
+
+    make_row(parent) builds an empty row widget and bind_row(row, item) fills it in. Rows are
+    recycled as the list scrolls, so cost follows the window size rather than len(items).
+    A row already showing an item with the same key(item) isn't rebound. on_layout(first, last),
+    if given, is told the range of items laid out after every scroll or resize."""
+
+    def __init__(self, parent, row_height, make_row, bind_row, key=id, gap=8, overscan=2, on_layout=None):
+        super().__init__(parent, bg=BG)
+        self.row_height = row_height
+        self.pitch = row_height + gap
+        self.make_row = make_row
+        self.bind_row = bind_row
+        self.key = key
+        self.overscan = overscan
+        self.on_layout = on_layout
+        self.items = []
+        self._slots = []  # [row, canvas window id, key of the bound item or None]
+
+        self.canvas = tk.Canvas(self, bg=BG, highlightthickness=0, yscrollincrement=self.pitch // 4)
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind_all(sequence, self._on_wheel, add="+")
+
+    def set_items(self, items, reset_scroll=False):
+        self.items = items
+        self._update_scrollregion()
+        if reset_scroll:
+            self.canvas.yview_moveto(0)
+        self._layout()
+
+    def refresh(self):
+        """Rebinds every visible row, for when item state changed but the list didn't."""
+        for slot in self._slots:
+            slot[2] = None
+        self._layout()
+
+    def bound_rows(self):
+        """(key, row) for every row currently showing an item."""
+        return [(bound, row) for row, _, bound in self._slots if bound is not None]
+
+    def _update_scrollregion(self):
+        height = max(len(self.items) * self.pitch, 1)
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), height))
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self._layout()
+
+    def _on_wheel(self, event):
+        # bind_all is shared by every list, so only scroll the one under the pointer
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not (str(widget) + ".").startswith(str(self) + "."):
+            return
+        direction = -1 if (event.num == 4 or getattr(event, "delta", 0) > 0) else 1
+        self.canvas.yview_scroll(direction * 3, "units")
+        self._layout()
+
+    def _on_resize(self, event):
+        for _, window, _ in self._slots:
+            self.canvas.itemconfigure(window, width=event.width)
+        self._update_scrollregion()
+        self._layout()
+
+    def _layout(self):
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.pitch) - self.overscan)
+        last = min(len(self.items), int((top + self.canvas.winfo_height()) // self.pitch) + 1 + self.overscan)
+
+        while len(self._slots) < last - first:
+            row = self.make_row(self.canvas)
+            window = self.canvas.create_window(0, 0, window=row, anchor="nw",
+                                               width=self.canvas.winfo_width(), height=self.row_height)
+            self._slots.append([row, window, None])
+
+        # Item i always lands in slot i % pool size, so scrolling by one row rebinds one slot
+        used = set()
+        for index in range(first, last):
+            slot = self._slots[index % len(self._slots)]
+            used.add(id(slot))
+            item = self.items[index]
+            key = self.key(item)
+            if slot[2] != key:
+                self.bind_row(slot[0], item)
+                slot[2] = key
+            self.canvas.coords(slot[1], 0, index * self.pitch)
+        for slot in self._slots:
+            if id(slot) not in used:
+                # Park spare rows above the scroll region, where the view never reaches
+                self.canvas.coords(slot[1], 0, -2 * self.pitch)
+                slot[2] = None
+        if self.on_layout:
+            self.on_layout(first, last)